@@ -0,0 +1,50 @@
+"""Компактное JSON-представление постов и страниц ленты."""
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import quote_etag
+
+# Без пробелов и \u-экранирования кириллицы: ответ заметно короче.
+JSON_DUMPS_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def serialize_post(post):
+    return {
+        'id': post.id,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comments': post.comment_count,
+    }
+
+
+def serialize_page(page):
+    paginator = page.paginator
+    return {
+        'results': [serialize_post(post) for post in page],
+        'next': paginator.next_cursor,
+        'previous': paginator.previous_cursor,
+    }
+
+
+def page_etag(page):
+    """Сильный ETag страницы без её сериализации.
+
+    Состав страницы задают свежайший pub_date и id постов. updated
+    и число комментариев ловят правки постов, а также переименование
+    группы или автора - сигналы posts сдвигают updated.
+    """
+    posts = list(page)
+    state = [
+        max((post.pub_date for post in posts), default=None),
+        [(post.id, post.updated, post.comment_count) for post in posts],
+        page.paginator.next_cursor,
+        page.paginator.previous_cursor,
+    ]
+    digest = hashlib.sha1(
+        json.dumps(state, cls=DjangoJSONEncoder).encode()
+    ).hexdigest()
+    return quote_etag(digest)
@@ -0,0 +1,94 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.constants import CURSOR_PARAM, PAGINATOR_COUNT
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(PAGINATOR_COUNT + 2)
+        ]
+        cls.posts.reverse()
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_feeds(self):
+        """все ленты отдают одни и те же посты в JSON"""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', kwargs={'slug': self.group.slug}),
+            reverse('api:profile', kwargs={'username': 'author'}),
+            reverse('api:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.reader_client.get(url).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.id for post in self.posts[:PAGINATOR_COUNT]]
+                )
+                self.assertEqual(data['results'][0], {
+                    'id': self.posts[0].id,
+                    'text': self.posts[0].text,
+                    'pub_date': data['results'][0]['pub_date'],
+                    'author': 'author',
+                    'group': 'group',
+                    'image': None,
+                    'comments': 0,
+                })
+                next_page = self.reader_client.get(
+                    url, {CURSOR_PARAM: data['next']}
+                ).json()
+                self.assertEqual(len(next_page['results']), 2)
+
+    def test_not_modified(self):
+        """повторный запрос с ETag получает 304 до изменения ленты"""
+        url = reverse('api:index')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        etag = response['ETag']
+        Post.objects.create(author=self.author, text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_errors(self):
+        """ошибки тоже в JSON, лента подписок только для авторизованных"""
+        responses = (
+            (self.client.get(reverse('api:follow_index')), 401),
+            (self.client.get(
+                reverse('api:group_list', kwargs={'slug': 'missing'})
+            ), 404),
+            (self.client.post(reverse('api:index')), 405),
+        )
+        for response, status in responses:
+            with self.subTest(status=status):
+                self.assertEqual(response.status_code, status)
+        self.assertIn('detail', responses[0][0].json())
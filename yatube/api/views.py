@@ -0,0 +1,72 @@
+"""Ленты постов в JSON с условными GET-запросами по ETag."""
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+
+from posts.constants import CURSOR_PARAM, PAGINATOR_COUNT
+from posts.models import Group, Post, User
+from posts.timeline import TimelinePaginator
+from posts.utils import CursorPaginator
+
+from .serializers import JSON_DUMPS_PARAMS, page_etag, serialize_page
+
+
+def error(detail, status):
+    return JsonResponse(
+        {'detail': detail}, status=status, json_dumps_params=JSON_DUMPS_PARAMS
+    )
+
+
+def feed(request, paginator, private=False):
+    """Страница ленты или 304, если у клиента она уже есть."""
+    page = paginator.get_page(request.GET.get(CURSOR_PARAM))
+    etag = page_etag(page)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(
+            serialize_page(page), json_dumps_params=JSON_DUMPS_PARAMS
+        )
+    response['ETag'] = etag
+    # Клиент хранит ответ, но каждый раз сверяет ETag с сервером.
+    patch_cache_control(response, no_cache=True)
+    if private:
+        patch_cache_control(response, private=True)
+    return response
+
+
+@require_safe
+def index(request):
+    return feed(
+        request, CursorPaginator(Post.objects.for_listing(), PAGINATOR_COUNT)
+    )
+
+
+@require_safe
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Группа не найдена.', 404)
+    return feed(
+        request, CursorPaginator(group.posts.for_listing(), PAGINATOR_COUNT)
+    )
+
+
+@require_safe
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Пользователь не найден.', 404)
+    return feed(
+        request, CursorPaginator(author.posts.for_listing(), PAGINATOR_COUNT)
+    )
+
+
+@require_safe
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', 401)
+    return feed(
+        request,
+        TimelinePaginator(request.user, PAGINATOR_COUNT),
+        private=True
+    )
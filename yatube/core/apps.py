@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished, request_started
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from . import querylog
+
+        connection_created.connect(querylog.install)
+        request_started.connect(querylog.start_scope)
+        request_finished.connect(querylog.end_scope)
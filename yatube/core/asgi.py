@@ -0,0 +1,173 @@
+"""ASGI-обёртка над WSGI-приложением Django 2.2.
+
+Django до 3.0 не умеет ASGI, поэтому view по-прежнему синхронные и
+выполняются в пуле потоков (ASGI_THREADS). Выигрыш в другом: тело
+запроса читается и ответ отдаётся клиенту в цикле событий, поток
+занят только на время работы view. Медленный клиент держит
+соединение, а не воркер.
+
+После перехода на Django 3.0+ вместо ASGIHandler берётся
+django.core.asgi.get_asgi_application(), а независимые запросы к базе,
+которые сейчас выполняет core.parallel.gather, переходят на
+asyncio.gather в async-view.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Тело запроса больше этого размера уходит из памяти во временный файл.
+BODY_MEMORY_SIZE = 1024 * 1024
+
+
+class RequestAborted(Exception):
+    """Клиент отключился, не дослав тело запроса."""
+
+
+def _latin1(value):
+    return value.encode('utf-8').decode('latin-1')
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ по scope (PEP 3333)."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': _latin1(scope.get('root_path', '')),
+        'PATH_INFO': _latin1(scope['path']),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = f'HTTP_{name}'
+        if name in environ:
+            value = f'{environ[name]},{value}'
+        environ[name] = value
+    # Длина по прочитанному телу: при chunked-передаче заголовка нет,
+    # а без CONTENT_LENGTH Django считает тело пустым.
+    environ['CONTENT_LENGTH'] = str(body.seek(0, 2))
+    body.seek(0)
+    return environ
+
+
+class ASGIHandler:
+    """ASGI 3 приложение: запрос к WSGI-приложению в пуле потоков."""
+
+    def __init__(self, wsgi_application, threads):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип: {scope["type"]}')
+        try:
+            body = await self.read_body(receive)
+        except RequestAborted:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            status, headers, chunks, response = await loop.run_in_executor(
+                self.executor, self.run, wsgi_environ(scope, body)
+            )
+        finally:
+            body.close()
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': headers,
+        })
+        if response is None:
+            for chunk in chunks:
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        else:
+            await self.stream(loop, response, send)
+        await send({'type': 'http.response.body'})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_MEMORY_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                raise RequestAborted
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    def run(self, environ):
+        """Выполняет WSGI-приложение в потоке пула.
+
+        Обычный ответ читается целиком и закрывается здесь же: закрытие
+        шлёт request_finished, а он закрывает соединения с базой этого
+        потока. Потоковый ответ отдаётся как есть для stream().
+        """
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        response = self.wsgi_application(environ, start_response)
+        status, headers = started
+        headers = [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+        ]
+        status = int(status.split(' ', 1)[0])
+        if getattr(response, 'streaming', False):
+            return status, headers, None, response
+        try:
+            return status, headers, list(response), None
+        finally:
+            response.close()
+
+    async def stream(self, loop, response, send):
+        chunks = iter(response)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(
+                    self.executor, next, chunks, None
+                )
+                if chunk is None:
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+        finally:
+            await loop.run_in_executor(self.executor, response.close)
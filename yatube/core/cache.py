@@ -0,0 +1,255 @@
+"""Двухуровневый кеш: LRU в памяти процесса перед общим бэкендом.
+
+Локальный уровень общий для всех потоков процесса, ограничен по числу
+записей и времени жизни (LOCAL_TIMEOUT). Общий уровень - любой другой
+кеш из CACHES (файловый, в базе), видимый всем воркерам.
+
+Запись (set, set_many), удаление и incr пишут изменённые ключи
+в журнал в общем кеше: номер последней записи (SEQUENCE_KEY) и списки
+ключей под каждым номером. Остальные воркеры читают журнал не чаще
+раза в SYNC_INTERVAL секунд и выкидывают из локального уровня только
+эти ключи. Если воркер отстал больше чем на MAX_LOG_GAP записей или
+записи журнала уже истекли, локальный уровень сбрасывается целиком;
+clear сбрасывает его у всех через поколение (GENERATION_KEY). Только
+изменение, чья запись журнала потеряна при гонке incr в общем кеше,
+до других воркеров доходит не позже LOCAL_TIMEOUT.
+"""
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+GENERATION_KEY = 'tiered-cache-generation'
+SEQUENCE_KEY = 'tiered-cache-sequence'
+LOG_KEY = 'tiered-cache-deleted:{}'
+# Записи журнала живут дольше, чем воркер может не сверяться с ним.
+LOG_TIMEOUT = 60
+MAX_LOG_GAP = 100
+
+MISSING = object()
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """LRU с TTL и счётчиками попаданий."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.generation = None
+        self.sequence = None
+        self.checked_at = None
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return MISSING
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            self.local_hits += 1
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def count(self, shared_hits=0, misses=0):
+        with self.lock:
+            self.shared_hits += shared_hits
+            self.misses += misses
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    """Бэкенд кеша с локальным уровнем перед общим.
+
+    OPTIONS:
+        SHARED - алиас общего кеша в CACHES;
+        LOCAL_MAX_ENTRIES - размер LRU (1000);
+        LOCAL_TIMEOUT - время жизни локальной записи, с (5);
+        SYNC_INTERVAL - период сверки поколения, с (1).
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.sync_interval = options.get('SYNC_INTERVAL', 1)
+        with _tiers_lock:
+            if name not in _tiers:
+                _tiers[name] = LocalTier(
+                    options.get('LOCAL_MAX_ENTRIES', 1000)
+                )
+            self.local = _tiers[name]
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def stats(self):
+        """Счётчики попаданий процесса."""
+        return {
+            'local_hits': self.local.local_hits,
+            'shared_hits': self.local.shared_hits,
+            'misses': self.local.misses,
+        }
+
+    def _local_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return max(0, min(timeout - time.time(), self.local_timeout))
+
+    def _sync(self):
+        local = self.local
+        now = time.monotonic()
+        if (local.checked_at is not None
+                and now - local.checked_at < self.sync_interval):
+            return
+        if not local.sync_lock.acquire(blocking=False):
+            # Журнал уже читает другой поток.
+            return
+        try:
+            local.checked_at = now
+            state = self.shared.get_many([GENERATION_KEY, SEQUENCE_KEY])
+            generation = state.get(GENERATION_KEY)
+            sequence = state.get(SEQUENCE_KEY, 0)
+            if generation != local.generation or local.sequence is None:
+                local.clear()
+            elif sequence != local.sequence:
+                self._apply_log(local.sequence, sequence)
+            local.generation, local.sequence = generation, sequence
+        finally:
+            local.sync_lock.release()
+
+    def _apply_log(self, start, end):
+        if not 0 < end - start <= MAX_LOG_GAP:
+            self.local.clear()
+            return
+        log_keys = [
+            LOG_KEY.format(number) for number in range(start + 1, end + 1)
+        ]
+        log = self.shared.get_many(log_keys)
+        if len(log) < len(log_keys):
+            self.local.clear()
+            return
+        for keys in log.values():
+            self.local.delete(*keys)
+
+    def _publish(self, keys):
+        """Сообщает остальным воркерам об изменённых ключах."""
+        self.local.delete(*keys)
+        self.shared.add(SEQUENCE_KEY, 0, None)
+        sequence = self.shared.incr(SEQUENCE_KEY)
+        self.shared.set(LOG_KEY.format(sequence), keys, LOG_TIMEOUT)
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        local_key = self.make_key(key, version)
+        value = self.local.get(local_key)
+        if value is not MISSING:
+            return value
+        value = self.shared.get(key, MISSING, version=version)
+        if value is MISSING:
+            self.local.count(misses=1)
+            return default
+        self.local.count(shared_hits=1)
+        self.local.set(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        rest = []
+        for key in keys:
+            value = self.local.get(self.make_key(key, version))
+            if value is MISSING:
+                rest.append(key)
+            else:
+                found[key] = value
+        if rest:
+            shared = self.shared.get_many(rest, version=version)
+            self.local.count(
+                shared_hits=len(shared), misses=len(rest) - len(shared)
+            )
+            for key, value in shared.items():
+                self.local.set(
+                    self.make_key(key, version), value, self.local_timeout
+                )
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        local_key = self.make_key(key, version)
+        self._publish([local_key])
+        self.local.set(local_key, value, self._local_ttl(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        local_keys = {key: self.make_key(key, version) for key in data}
+        self._publish(list(local_keys.values()))
+        ttl = self._local_ttl(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self.local.set(local_keys[key], value, ttl)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self.local.set(
+                self.make_key(key, version), value, self._local_ttl(timeout)
+            )
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.shared.delete(key, version=version)
+        self._publish([self.make_key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self.shared.delete_many(keys, version=version)
+        self._publish([self.make_key(key, version) for key in keys])
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._publish([self.make_key(key, version)])
+        return value
+
+    def clear(self):
+        self.shared.clear()
+        generation = uuid.uuid4().hex
+        self.shared.set(GENERATION_KEY, generation, None)
+        self.local.clear()
+        self.local.generation = generation
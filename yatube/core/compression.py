@@ -0,0 +1,173 @@
+"""Минификация HTML и сжатие ответов.
+
+CompressionMiddleware сворачивает пробельные отступы шаблонов в HTML
+и сжимает текстовые ответы в br (если установлен пакет brotli) или
+gzip по Accept-Encoding. Сжатый результат ответа, одинакового для всех
+(анонимного, без CSRF-токена и Cache-Control: private), хранится
+в кеше COMPRESSION_CACHE_ALIAS под хешем содержимого: одинаковые
+страницы (собранные из кеша фрагментов) повторно не сжимаются.
+Страницы вошедших пользователей и формы сжимаются каждый раз - их
+хеш всё равно не повторится. Без алиаса в CACHES сжатие не кешируется.
+
+BREACH: по размеру сжатого ответа можно подбирать секрет, если он
+выводится рядом с текстом из запроса. Единственный такой секрет
+в HTML - CSRF-токен, а Django выводит его замаскированным новой
+случайной солью в каждом ответе, так что подбирать нечего. Другие
+секреты (ключи API, токены сброса пароля) в сжимаемые страницы
+выводить нельзя.
+"""
+import gzip
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Содержимое этих элементов выводится как есть.
+PRESERVED = re.compile(
+    r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.S | re.I
+)
+TAG_OR_TEXT = re.compile(r'(<[^>]*>)')
+COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.S)
+SPACES = re.compile(r'\s+')
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+
+
+def collapse(match):
+    # Браузер всё равно показывает цепочку пробелов как один пробел;
+    # перевод строки оставляем, чтобы исходник страницы был читаемым.
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(html):
+    """HTML без комментариев и повторяющихся пробелов.
+
+    Пробелы внутри тегов (в значениях атрибутов) и содержимое pre,
+    textarea, script и style не меняются; <br> из фильтра linebreaks
+    и одиночные пробелы между строчными элементами сохраняются.
+    """
+    parts = PRESERVED.split(html)
+    result = []
+    # split с двумя группами: текст, элемент целиком, имя тега, ...
+    for index in range(0, len(parts), 3):
+        text = COMMENT.sub('', parts[index])
+        for chunk in TAG_OR_TEXT.split(text):
+            if chunk.startswith('<'):
+                result.append(chunk)
+            else:
+                result.append(SPACES.sub(collapse, chunk))
+        if index + 1 < len(parts):
+            result.append(parts[index + 1])
+    return ''.join(result).strip()
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещённых (q=0)."""
+    encodings = set()
+    for item in header.split(','):
+        name, *params = item.strip().lower().split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            encodings.add(name)
+    return encodings
+
+
+def choose_encoding(header):
+    encodings = accepted_encodings(header)
+    if brotli is not None and 'br' in encodings:
+        return 'br'
+    if 'gzip' in encodings:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.COMPRESSION_LEVEL)
+    # mtime=0: одинаковое содержимое даёт одинаковые байты.
+    return gzip.compress(data, settings.COMPRESSION_LEVEL, mtime=0)
+
+
+def is_shared(request, response):
+    """Ответ одинаков для всех, его сжатие стоит кешировать."""
+    if request.META.get('CSRF_COOKIE_USED'):
+        return False
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return False
+    return 'private' not in response.get('Cache-Control', '')
+
+
+def cached_compress(data, encoding):
+    if settings.COMPRESSION_CACHE_ALIAS not in settings.CACHES:
+        return compress(data, encoding)
+    cache = caches[settings.COMPRESSION_CACHE_ALIAS]
+    key = 'compressed:{}:{}'.format(
+        encoding, hashlib.sha1(data).hexdigest()
+    )
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding)
+        cache.set(key, compressed, settings.COMPRESSION_CACHE_TIMEOUT)
+    return compressed
+
+
+class CompressionMiddleware:
+    """Минифицирует HTML и сжимает ответ.
+
+    Ставится в MIDDLEWARE выше всех, кто меняет содержимое ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').lower()
+        if settings.HTML_MINIFY and content_type.startswith('text/html'):
+            response.content = minify_html(
+                response.content.decode(response.charset)
+            ).encode(response.charset)
+            response['Content-Length'] = str(len(response.content))
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if encoding is None:
+            return response
+        if is_shared(request, response):
+            compressed = cached_compress(response.content, encoding)
+        else:
+            compressed = compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # Как у GZipMiddleware: побайтно ответ уже другой.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,46 @@
+"""Запись в базу с повтором при блокировке."""
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db import transaction
+
+LOCKED_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_locked(error):
+    return any(message in str(error) for message in LOCKED_ERRORS)
+
+
+def retry_on_lock(func=None, *, using=DEFAULT_DB_ALIAS):
+    """Выполняет func в транзакции, при блокировке базы - заново.
+
+    До DATABASE_WRITE_RETRIES повторов с экспоненциальной паузой от
+    DATABASE_RETRY_DELAY секунд и случайным разбросом, чтобы
+    столкнувшиеся воркеры не повторяли одновременно. Внутри чужой
+    транзакции повтора нет: повторять надо её целиком.
+    """
+    if func is None:
+        return lambda func: retry_on_lock(func, using=using)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if connections[using].in_atomic_block:
+            with transaction.atomic(using=using):
+                return func(*args, **kwargs)
+        for attempt in range(settings.DATABASE_WRITE_RETRIES + 1):
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if (not is_locked(error)
+                        or attempt == settings.DATABASE_WRITE_RETRIES):
+                    raise
+            time.sleep(
+                settings.DATABASE_RETRY_DELAY * 2 ** attempt
+                * random.uniform(0.5, 1.5)
+            )
+
+    return wrapper
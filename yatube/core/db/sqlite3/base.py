@@ -0,0 +1,46 @@
+"""Бэкенд SQLite с настройками для нескольких воркеров.
+
+Дополнительные ключи OPTIONS (в sqlite3.connect не передаются):
+    pragmas - PRAGMA, выполняемые на каждом новом соединении
+        (journal_mode=WAL, synchronous, mmap_size, cache_size,
+        busy_timeout);
+    transaction_mode - режим BEGIN для transaction.atomic: DEFERRED
+        (по умолчанию в SQLite), IMMEDIATE или EXCLUSIVE.
+
+IMMEDIATE берёт блокировку записи в начале транзакции. С DEFERRED
+транзакция, начавшая с чтения, не может дождаться блокировки при
+первой записи: SQLite сразу отвечает "database is locked", busy_timeout
+тут не помогает.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, settings_dict, *args, **kwargs):
+        super().__init__(settings_dict, *args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('pragmas', {})
+        self.transaction_mode = options.get('transaction_mode', 'DEFERRED')
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode: ожидается одно из {TRANSACTION_MODES}.'
+            )
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,57 @@
+"""Бэкенд Jinja2 с замером render и кеш фрагментов для его шаблонов.
+
+Нужен пакет Jinja2; модуль импортируется, только если бэкенд указан
+в TEMPLATES (YATUBE_TEMPLATES=jinja2).
+"""
+from django.core.cache import InvalidCacheBackendError, cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template.backends import jinja2 as jinja2_backend
+from django.test.signals import template_rendered
+from markupsafe import Markup
+
+from .metrics import TimedRender
+
+
+class Template(TimedRender, jinja2_backend.Template):
+
+    def render(self, context=None, request=None):
+        # Как шаблоны Django в тестах: по сигналу тестовый клиент
+        # собирает response.context и response.templates. Вне тестов
+        # приёмников нет, и сигнал не отправляется.
+        if template_rendered.has_listeners():
+            template_rendered.send(
+                sender=self, template=self.template,
+                context={**(context or {}), 'request': request}
+            )
+        return super().render(context, request)
+
+
+class Jinja2(jinja2_backend.Jinja2):
+
+    def from_string(self, template_code):
+        return Template(self.env.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+
+def fragment_cache():
+    # Тот же кеш, что у тега {% cache %} Django.
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return cache
+
+
+def cache_fragment(timeout, fragment_name, *vary_on, caller):
+    """Аналог {% cache %}: {% call cache_fragment(...) %}...{% endcall %}.
+
+    Ключ совпадает с ключом тега Django при тех же vary_on, поэтому
+    сброс фрагмента (posts.signals) работает для обоих движков.
+    """
+    key = make_template_fragment_key(fragment_name, vary_on)
+    value = fragment_cache().get(key)
+    if value is None:
+        value = caller()
+        fragment_cache().set(key, value, timeout)
+    return Markup(value)
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def sync(alias):
+    """Копирует основную базу SQLite в реплику (backup API)."""
+    source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+        'С --interval повторяет копирование, пока не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Период копирования, с.')
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('Реплики не настроены (YATUBE_REPLICAS).')
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError(
+                'Копирование только для SQLite: у других СУБД своя '
+                'репликация.'
+            )
+        while True:
+            for alias in replicas:
+                start = time.perf_counter()
+                sync(alias)
+                self.stdout.write(
+                    f'{alias}: {(time.perf_counter() - start) * 1000:.0f} мс'
+                )
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
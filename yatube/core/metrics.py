@@ -0,0 +1,315 @@
+"""Замеры запросов: SQL, шаблоны, кеш.
+
+MetricsMiddleware на время запроса ставит обёртку выполнения SQL на все
+соединения и кладёт RequestMetrics в thread-local. Туда же пишут
+бэкенды шаблонов DjangoTemplates и core.jinja2.Jinja2 (время render
+без SQL, выполненного внутри шаблона) и кеш InstrumentedCache
+(попадания и промахи). Итог уходит в заголовок Server-Timing и
+в скользящее окно последних запросов по имени URL, которое отдаёт
+core:metrics.
+
+Работа вне запроса - задачи очереди и пул миниатюр - не входит в total
+ни одного запроса. Её замеряет timer(name): окна таймеров лежат в той
+же сводке под ключом timers.
+
+Включается переменной окружения YATUBE_METRICS=1 (METRICS_ENABLED).
+Выключенная middleware не загружается (MiddlewareNotUsed), кеш не
+оборачивается, бэкенд шаблонов проверяет только thread-local.
+"""
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends import django as django_backend
+
+# Сколько последних запросов хранить на каждое имя URL.
+WINDOW = 1000
+# Верхние границы корзин гистограммы времени ответа, мс.
+BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000)
+FIELDS = ('total_ms', 'sql_ms', 'template_ms', 'queries')
+
+_local = threading.local()
+
+
+def current():
+    """Замеры текущего запроса или None."""
+    return getattr(_local, 'metrics', None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.total_time = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка выполнения SQL (connection.execute_wrapper)."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries += 1
+
+    def sample(self):
+        return (
+            self.total_time * 1000,
+            self.sql_time * 1000,
+            self.template_time * 1000,
+            self.queries,
+            self.cache_hits,
+            self.cache_misses,
+        )
+
+    def server_timing(self):
+        return ', '.join((
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ))
+
+
+def _percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def _stats(values):
+    values = sorted(values)
+    return {
+        'mean': round(sum(values) / len(values), 2),
+        'p50': round(_percentile(values, 0.5), 2),
+        'p95': round(_percentile(values, 0.95), 2),
+        'p99': round(_percentile(values, 0.99), 2),
+        'max': round(values[-1], 2),
+    }
+
+
+class Registry:
+    """Скользящие окна замеров по именам URL, общие для потоков."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.samples = {}
+        self.timers = {}
+        self.lock = threading.Lock()
+
+    def _append(self, windows, name, sample):
+        with self.lock:
+            if name not in windows:
+                windows[name] = deque(maxlen=self.window)
+            windows[name].append(sample)
+
+    def add(self, name, metrics):
+        self._append(self.samples, name, metrics.sample())
+
+    def add_timing(self, name, elapsed):
+        """Замер таймера name, elapsed в секундах."""
+        self._append(self.timers, name, elapsed * 1000)
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+            self.timers.clear()
+
+    def summary(self):
+        with self.lock:
+            samples = {
+                name: list(values) for name, values in self.samples.items()
+            }
+            timers = {
+                name: list(values) for name, values in self.timers.items()
+            }
+        result = {
+            name: self._summarize(values)
+            for name, values in sorted(samples.items())
+        }
+        if timers:
+            result['timers'] = {
+                name: {'count': len(values), 'ms': _stats(values)}
+                for name, values in sorted(timers.items())
+            }
+        return result
+
+    @staticmethod
+    def _summarize(samples):
+        columns = list(zip(*samples))
+        result = {'count': len(samples)}
+        for field, values in zip(FIELDS, columns):
+            result[field] = _stats(values)
+        result['cache_hits'] = sum(columns[4])
+        result['cache_misses'] = sum(columns[5])
+        histogram = dict.fromkeys([*map(str, BUCKETS), 'inf'], 0)
+        for total in columns[0]:
+            bucket = next(
+                (str(bound) for bound in BUCKETS if total <= bound), 'inf'
+            )
+            histogram[bucket] += 1
+        result['histogram'] = histogram
+        return result
+
+
+registry = Registry()
+
+
+@contextmanager
+def timer(name):
+    """Замеряет блок и добавляет время в окно таймера name."""
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        registry.add_timing(name, perf_counter() - start)
+
+
+class MetricsMiddleware:
+    """Замеряет запрос и добавляет заголовок Server-Timing.
+
+    Ставится первой в MIDDLEWARE, чтобы total включал остальные.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        _local.metrics = metrics
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.metrics = None
+        metrics.total_time = perf_counter() - start
+        response['Server-Timing'] = metrics.server_timing()
+        if request.resolver_match is not None:
+            registry.add(request.resolver_match.view_name, metrics)
+        return response
+
+
+class TimedRender:
+    """render шаблона с замером; примесь к шаблонам обоих бэкендов."""
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+        # Вложенный render (render_to_string из тега) уже в замере.
+        metrics.template_depth += 1
+        start, sql_time = perf_counter(), metrics.sql_time
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if not metrics.template_depth:
+                metrics.template_time += (
+                    perf_counter() - start
+                    - (metrics.sql_time - sql_time)
+                )
+
+
+class Template(TimedRender, django_backend.Template):
+    pass
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Стандартный бэкенд шаблонов с замером времени render."""
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except django_backend.TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
+
+
+class InstrumentedCache(BaseCache):
+    """Обёртка кеша из OPTIONS['CACHE'], считающая попадания.
+
+    Ключи не преобразуются: make_key и версии - у обёрнутого кеша.
+    """
+    _missing = object()
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self.alias = params.get('OPTIONS', {})['CACHE']
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _count(hits, misses):
+        metrics = current()
+        if metrics is not None:
+            metrics.cache_hits += hits
+            metrics.cache_misses += misses
+
+    def get(self, key, default=None, version=None):
+        value = self.cache.get(key, self._missing, version=version)
+        if value is self._missing:
+            self._count(0, 1)
+            return default
+        self._count(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.cache.get_many(keys, version=version)
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+    def has_key(self, key, version=None):
+        return self.cache.has_key(key, version=version)  # noqa: W601
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.cache.set(key, value, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.set_many(data, timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.add(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.cache.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.cache.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        self.cache.delete_many(keys, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.cache.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.cache.decr(key, delta, version=version)
+
+    def clear(self):
+        self.cache.clear()
+
+    def close(self, **kwargs):
+        self.cache.close(**kwargs)
@@ -0,0 +1,69 @@
+"""Параллельное выполнение независимых запросов к базе.
+
+gather(*calls) выполняет первый вызов в текущем потоке, остальные - в
+пуле из QUERY_THREADS потоков, у каждого свои соединения с базой.
+Внутри транзакции (в том числе в TestCase) вызовы идут по очереди:
+другие соединения не видят её незафиксированных изменений.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from . import metrics, routers
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.QUERY_THREADS,
+                thread_name_prefix='query'
+            )
+    return _executor
+
+
+def _run(call, request_metrics, router_state):
+    routers.set_state(router_state)
+    with ExitStack() as stack:
+        if request_metrics is not None:
+            # Запросы из пула тоже попадают в Server-Timing.
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(request_metrics.execute)
+                )
+        try:
+            return call()
+        finally:
+            close_old_connections()
+            routers.set_state((False, False))
+
+
+def _in_transaction():
+    return any(
+        connection.in_atomic_block for connection in connections.all()
+    )
+
+
+def gather(*calls):
+    """Результаты вызовов в том же порядке; ошибка первого упавшего."""
+    if len(calls) < 2 or not settings.QUERY_THREADS or _in_transaction():
+        return [call() for call in calls]
+    executor = _get_executor()
+    request_metrics = metrics.current()
+    router_state = routers.get_state()
+    futures = [
+        executor.submit(_run, call, request_metrics, router_state)
+        for call in calls[1:]
+    ]
+    try:
+        first = calls[0]()
+    finally:
+        wait(futures)
+    return [first, *(future.result() for future in futures)]
@@ -0,0 +1,134 @@
+"""Журнал медленных и повторяющихся SQL-запросов.
+
+Обёртка выполнения ставится на каждое новое соединение (сигнал
+connection_created, см. CoreConfig.ready). Запросы дольше
+QUERYLOG_SLOW_MS пишутся в лог с местом вызова: строками кода проекта
+и строкой шаблона, если запрос выполнил шаблон.
+
+В пределах HTTP-запроса (между request_started и request_finished)
+считаются запросы одной формы - SQL без параметров, списки IN (...)
+свёрнуты. QUERYLOG_DUPLICATES одинаковых запросов - признак N+1: он
+пишется в лог, а в строгом режиме (QUERYLOG_STRICT, его включает
+тестовый раннер core.testing.StrictQueriesRunner) поднимает
+DuplicateQueryError прямо из view.
+"""
+import logging
+import os
+import re
+import sys
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'%s(?:, %s)+')
+# Сколько строк кода проекта показывать в месте вызова.
+STACK_DEPTH = 4
+
+_local = threading.local()
+
+
+class DuplicateQueryError(AssertionError):
+    """Повтор запроса одной формы в строгом режиме."""
+
+
+def shape(sql):
+    """Форма запроса: SQL без параметров, IN (%s, %s) как IN (%s)."""
+    if '%s, %s' in sql:
+        return IN_LIST_RE.sub('%s', sql)
+    return sql
+
+
+def _template_site(frame):
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if isinstance(node, Node) and getattr(node, 'token', None):
+            return f'{node.origin.name}:{node.token.lineno}'
+        frame = frame.f_back
+    return None
+
+
+def call_site():
+    """Строки кода проекта (снаружи внутрь) и шаблон, выполнившие запрос."""
+    frame = sys._getframe(1)
+    template = _template_site(frame)
+    lines = []
+    while frame is not None and len(lines) < STACK_DEPTH:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(settings.BASE_DIR)
+                and filename != __file__
+                and 'site-packages' not in filename):
+            lines.append(
+                f'{os.path.relpath(filename, settings.BASE_DIR)}:'
+                f'{frame.f_lineno} in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    if template:
+        lines.insert(0, f'template {template}')
+    return '\n  '.join(lines) or 'вне кода проекта'
+
+
+def start_scope(**kwargs):
+    """Начало границы поиска повторов (сигнал request_started)."""
+    _local.counts = {}
+
+
+def end_scope(**kwargs):
+    _local.counts = None
+
+
+@contextmanager
+def scope():
+    """Граница поиска повторов вне HTTP-запроса."""
+    start_scope()
+    try:
+        yield
+    finally:
+        end_scope()
+
+
+def _check_duplicate(sql):
+    counts = getattr(_local, 'counts', None)
+    if counts is None:
+        return
+    key = shape(sql)
+    counts[key] = counts.get(key, 0) + 1
+    if counts[key] != settings.QUERYLOG_DUPLICATES:
+        return
+    message = (
+        f'{counts[key]} одинаковых запросов за запрос (N+1?): {key}\n'
+        f'  {call_site()}'
+    )
+    if settings.QUERYLOG_STRICT:
+        raise DuplicateQueryError(message)
+    logger.warning(message)
+
+
+def execute(execute, sql, params, many, context):
+    """Обёртка выполнения SQL (connection.execute_wrappers)."""
+    _check_duplicate(sql)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (perf_counter() - start) * 1000
+        if duration >= settings.QUERYLOG_SLOW_MS:
+            logger.warning(
+                f'Медленный запрос {duration:.1f} мс: {sql} {params}\n'
+                f'  {call_site()}'
+            )
+
+
+def install(connection, **kwargs):
+    """Обработчик connection_created: ставит обёртку на соединение.
+
+    Первой в списке: соединение может открыться внутри временной
+    обёртки (connection.execute_wrapper), которая при выходе снимает
+    последнюю.
+    """
+    if execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, execute)
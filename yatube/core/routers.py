@@ -0,0 +1,95 @@
+"""Чтение с реплик и запись в основную базу.
+
+Реплики - алиасы из DATABASE_REPLICAS. С них читают только GET/HEAD
+запросы, прошедшие через ReplicaMiddleware; команды, shell и POST
+читают основную базу. После первой записи запрос до конца читает
+основную базу, а клиент получает cookie REPLICA_STICKY_COOKIE: ещё
+REPLICA_STICKY_SECONDS секунд его чтения тоже идут в основную базу,
+пока реплики догоняют (read-your-writes).
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Сессии всегда из основной базы: отставшая реплика не должна
+# разлогинивать пользователя.
+PRIMARY_APPS = ('sessions',)
+
+_local = threading.local()
+
+
+def get_state():
+    """Состояние текущего потока для передачи в другой поток."""
+    return getattr(_local, 'use_replica', False), getattr(
+        _local, 'wrote', False
+    )
+
+
+def set_state(state):
+    _local.use_replica, _local.wrote = state
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        replicas = settings.DATABASE_REPLICAS
+        # Внутри транзакции реплика не видит её незафиксированных
+        # изменений.
+        if (replicas and getattr(_local, 'use_replica', False)
+                and model._meta.app_label not in PRIMARY_APPS
+                and not connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.use_replica = False
+        _local.wrote = True
+        # Явно: иначе Django пишет объект туда, откуда он прочитан.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схема реплик приходит вместе с данными (sync_replicas).
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик на время безопасного запроса."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        cookie = settings.REPLICA_STICKY_COOKIE
+        try:
+            sticky = float(request.COOKIES.get(cookie, 0)) > time.time()
+        except ValueError:
+            sticky = False
+        set_state((
+            request.method in ('GET', 'HEAD') and not sticky, False
+        ))
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = get_state()[1]
+            set_state((False, False))
+        if wrote and settings.DATABASE_REPLICAS:
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                cookie, str(time.time() + window), max_age=window,
+                httponly=True, samesite='Lax'
+            )
+        return response
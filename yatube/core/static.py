@@ -0,0 +1,167 @@
+"""Сборка и раздача статики без отдельного веб-сервера.
+
+CompressedManifestStorage - хранилище для manage.py collectstatic:
+имена файлов с хешем содержимого (манифест staticfiles.json, как
+у ManifestStaticFilesStorage) и сжатые копии .gz и, если установлен
+пакет brotli, .br рядом с каждым текстовым файлом.
+
+StaticFilesApplication - WSGI-обёртка над приложением Django: отдаёт
+файлы из STATIC_ROOT, выбирая сжатую копию по Accept-Encoding. Файлы
+с хешем в имени браузер кеширует на год без перепроверки (immutable),
+остальные - на STATIC_MAX_AGE секунд.
+"""
+import gzip
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+from .compression import accepted_encodings, brotli
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.xml',
+    '.ico', '.ttf', '.otf', '.eot',
+)
+# Меньшие файлы почти не сжимаются, а лишний файл стоит stat.
+MIN_COMPRESS_SIZE = 256
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Кодировки в порядке предпочтения: расширение сжатой копии.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress(data):
+    """Сжатые копии data, которые заметно меньше исходника."""
+    variants = {'.gz': gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    return {
+        suffix: content for suffix, content in variants.items()
+        if len(content) < len(data) * 0.95
+    }
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Сжимаются и исходные имена: их отдаёт {% static %} до сборки
+        # и сторонний код, не знающий о манифесте.
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            with self.open(name) as file:
+                data = file.read()
+            if len(data) < MIN_COMPRESS_SIZE:
+                continue
+            for suffix, content in compress(data).items():
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(content))
+                yield name, name + suffix, True
+
+    def stored_name(self, name):
+        # collectstatic ещё не запускали: имена без хеша, как при DEBUG.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+
+class StaticFile:
+    def __init__(self, path, cache_control):
+        self.path = path
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        self.headers = [
+            ('Content-Type', content_type or 'application/octet-stream'),
+            ('Cache-Control', cache_control),
+            ('Last-Modified', formatdate(stat.st_mtime, usegmt=True)),
+            ('ETag', f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'),
+        ]
+        self.etag = self.headers[-1][1]
+        self.variants = [(None, path, stat.st_size)]
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                self.variants.insert(
+                    -1, (encoding, path + suffix,
+                         os.path.getsize(path + suffix))
+                )
+        if len(self.variants) > 1:
+            self.headers.append(('Vary', 'Accept-Encoding'))
+
+    def choose(self, accept_encoding):
+        encodings = accepted_encodings(accept_encoding)
+        for encoding, path, size in self.variants:
+            if encoding is None or encoding in encodings:
+                return encoding, path, size
+
+
+class StaticFilesApplication:
+    """WSGI-обёртка, отдающая собранную статику из STATIC_ROOT.
+
+    Список файлов читается один раз при запуске: после collectstatic
+    процесс нужно перезапустить. Без STATIC_ROOT или с адресом статики
+    на другом хосте все запросы идут в приложение.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.prefix = settings.STATIC_URL
+        self.files = {}
+        root = settings.STATIC_ROOT
+        if root and self.prefix.startswith('/') and os.path.isdir(root):
+            self.files = self.scan(root)
+
+    def scan(self, root):
+        manifest = os.path.join(root, 'staticfiles.json')
+        hashed = set()
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as file:
+                hashed = set(json.load(file).get('paths', {}).values())
+        short = f'public, max-age={settings.STATIC_MAX_AGE}'
+        files = {}
+        for directory, _, names in os.walk(root):
+            for name in names:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(directory, name)
+                url = os.path.relpath(path, root).replace(os.sep, '/')
+                files[url] = StaticFile(
+                    path, IMMUTABLE if url in hashed else short
+                )
+        return files
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        static_file = None
+        if path.startswith(self.prefix):
+            static_file = self.files.get(path[len(self.prefix):])
+        if static_file is None:
+            return self.application(environ, start_response)
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [
+                ('Allow', 'GET, HEAD'), ('Content-Length', '0')
+            ])
+            return []
+        if environ.get('HTTP_IF_NONE_MATCH') == static_file.etag:
+            start_response('304 Not Modified', static_file.headers[1:])
+            return []
+        encoding, file_path, size = static_file.choose(
+            environ.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        headers = static_file.headers + [('Content-Length', str(size))]
+        if encoding is not None:
+            headers.append(('Content-Encoding', encoding))
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(file_path, 'rb'))
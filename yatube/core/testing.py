@@ -0,0 +1,36 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class StrictQueriesRunner(DiscoverRunner):
+    """Тестовый раннер: повтор запроса одной формы в view - ошибка.
+
+    Фоновые задачи выполняются сразу (JOBS_EAGER) при любом окружении.
+    Файловый кеш (YATUBE_CACHE=shared или tiered) пишется во временный
+    каталог, а не в CACHE_DIR рабочей копии.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp()
+        self.strict_queries = override_settings(
+            QUERYLOG_STRICT=True, JOBS_EAGER=True,
+            CACHES=self.temporary_caches()
+        )
+        self.strict_queries.enable()
+
+    def temporary_caches(self):
+        return {
+            alias: {**config, 'LOCATION': self.cache_dir}
+            if config.get('LOCATION') == settings.CACHE_DIR else config
+            for alias, config in settings.CACHES.items()
+        }
+
+    def teardown_test_environment(self, **kwargs):
+        self.strict_queries.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,102 @@
+import asyncio
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.wsgi import get_wsgi_application
+from django.test import TransactionTestCase
+
+from core.asgi import ASGIHandler, wsgi_environ
+from posts.models import Post, User
+
+
+class ASGIHandlerTest(TransactionTestCase):
+    """Приложение вызывается как ASGI-сервер: scope, receive, send."""
+
+    def setUp(self):
+        self.application = ASGIHandler(get_wsgi_application(), 2)
+
+    def request(self, path, method='GET', query=b'', headers=(),
+                body=(b'',)):
+        messages = [
+            {'type': 'http.request', 'body': chunk, 'more_body': True}
+            for chunk in body
+        ]
+        messages[-1]['more_body'] = False
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query,
+            'headers': [(b'host', b'testserver'), *headers],
+        }
+        asyncio.run(self.application(scope, receive, send))
+        start, *bodies = sent
+        self.assertFalse(bodies[-1].get('more_body'))
+        return start, b''.join(
+            message.get('body', b'') for message in bodies
+        )
+
+    def test_get(self):
+        """страница с кириллицей в пути и параметрах"""
+        author = User.objects.create_user(username='author')
+        Post.objects.create(author=author, text='Томаты')
+        start, body = self.request(
+            '/search/', query='q=томаты'.encode()
+        )
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            (b'content-type', b'text/html; charset=utf-8'), start['headers']
+        )
+        self.assertIn('<mark>Томаты</mark>', body.decode())
+        self.assertEqual(self.request('/profile/нет/')[0]['status'], 404)
+
+    def test_post_body_in_chunks(self):
+        """тело запроса собирается из нескольких сообщений"""
+        messages = [
+            {'type': 'http.request', 'body': b'text=%D0%9F',
+             'more_body': True},
+            {'type': 'http.request', 'body': b'&group=1'},
+        ]
+
+        async def receive():
+            return messages.pop(0)
+
+        body = asyncio.run(self.application.read_body(receive))
+        request = WSGIRequest(wsgi_environ({
+            'method': 'POST',
+            'path': '/create/',
+            'headers': [
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'x-forwarded-for', b'10.0.0.1'),
+                (b'x-forwarded-for', b'10.0.0.2'),
+            ],
+        }, body))
+        self.assertEqual(request.POST.dict(), {'text': 'П', 'group': '1'})
+        self.assertEqual(
+            request.META['HTTP_X_FORWARDED_FOR'], '10.0.0.1,10.0.0.2'
+        )
+
+    def test_lifespan(self):
+        messages = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.application({'type': 'lifespan'}, receive, send))
+        self.assertEqual(
+            sent,
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import TieredCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tiered-tests',
+    },
+}
+
+
+@override_settings(CACHES=CACHES)
+class TieredCacheTest(SimpleTestCase):
+    """Два экземпляра с разными LOCATION ведут себя как два воркера."""
+
+    def worker(self, name, **options):
+        options.setdefault('SHARED', 'shared')
+        options.setdefault('SYNC_INTERVAL', 0)
+        return TieredCache(f'{self.id()}-{name}', {'OPTIONS': options})
+
+    def setUp(self):
+        caches['shared'].clear()
+
+    def test_local_tier_serves_repeated_reads(self):
+        first, second = self.worker('first'), self.worker('second')
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertEqual(second.get('key'), 'value')
+        self.assertIsNone(second.get('missing'))
+        self.assertEqual(
+            second.stats(),
+            {'local_hits': 1, 'shared_hits': 1, 'misses': 1}
+        )
+
+    def test_delete_invalidates_other_workers(self):
+        first, second = self.worker('first'), self.worker('second')
+        first.set('key', 'value')
+        self.assertEqual(second.get('key'), 'value')
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+
+    def test_set_invalidates_other_workers(self):
+        first, second = self.worker('first'), self.worker('second')
+        first.set('key', 1)
+        first.set_many({'a': 1, 'b': 1})
+        self.assertEqual(second.get('key'), 1)
+        self.assertEqual(second.get_many(['a', 'b']), {'a': 1, 'b': 1})
+        first.set('key', 2)
+        first.set_many({'a': 2, 'b': 2})
+        self.assertEqual(second.get('key'), 2)
+        self.assertEqual(second.get_many(['a', 'b']), {'a': 2, 'b': 2})
+        self.assertEqual(first.get('key'), 2)
+
+    def test_delete_keeps_other_local_keys(self):
+        """удаление выкидывает у других воркеров только свой ключ"""
+        first, second = self.worker('first'), self.worker('second')
+        first.set_many({'a': 1, 'b': 2})
+        second.get_many(['a', 'b'])
+        first.delete('a')
+        self.assertIsNone(second.get('a'))
+        self.assertEqual(second.get('b'), 2)
+        self.assertEqual(second.stats()['local_hits'], 1)
+
+    def test_lagging_worker_clears_local_tier(self):
+        first, second = self.worker('first'), self.worker('second')
+        first.set_many({'a': 1, 'b': 2})
+        second.get_many(['a', 'b'])
+        with mock.patch('core.cache.MAX_LOG_GAP', 1):
+            first.delete('a')
+            first.delete('c')
+            self.assertEqual(second.get('b'), 2)
+        self.assertEqual(second.stats()['local_hits'], 0)
+
+    def test_lru_is_bounded(self):
+        cache = self.worker('lru', LOCAL_MAX_ENTRIES=2)
+        for key in ('a', 'b', 'c'):
+            cache.set(key, key)
+        self.assertEqual(list(cache.local.entries), [
+            cache.make_key('b'), cache.make_key('c')
+        ])
+        self.assertEqual(cache.get('a'), 'a')
+        self.assertEqual(cache.stats()['shared_hits'], 1)
+
+    def test_local_timeout(self):
+        cache = self.worker('ttl', LOCAL_TIMEOUT=0)
+        cache.set('key', 'value')
+        caches['shared'].set('key', 'changed')
+        self.assertEqual(cache.get('key'), 'changed')
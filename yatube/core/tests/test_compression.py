@@ -0,0 +1,144 @@
+import gzip
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import compression
+from core.compression import CompressionMiddleware, minify_html
+
+PAGE = '''
+<!DOCTYPE html>
+<html>
+  <!-- шапка -->
+  <body>
+    <div class="card">
+      <p>Первая строка<br>вторая   строка</p>
+      <a href="/">раз</a> <a href="/">два</a>
+      <input value="два  пробела">
+    </div>
+    <pre>
+  код
+    с отступами
+</pre>
+    <textarea name="text">  текст
+  поста</textarea>
+    <script>
+      var a = "  ";
+    </script>
+  </body>
+</html>
+''' + '<p>абзац</p>\n    ' * 20
+
+
+class MinifyHTMLTest(SimpleTestCase):
+
+    def test_whitespace_collapsed(self):
+        html = minify_html(PAGE)
+        self.assertTrue(html.startswith('<!DOCTYPE html>\n<html>\n<body>'))
+        self.assertNotIn('\n ', html.split('<pre>')[0])
+        self.assertNotIn('шапка', html)
+        self.assertIn('<p>Первая строка<br>вторая строка</p>', html)
+        self.assertIn('<a href="/">раз</a> <a href="/">два</a>', html)
+        self.assertIn('<input value="два  пробела">', html)
+
+    def test_preformatted_kept(self):
+        html = minify_html(PAGE)
+        self.assertIn('<pre>\n  код\n    с отступами\n</pre>', html)
+        self.assertIn('>  текст\n  поста</textarea>', html)
+        self.assertIn(
+            '<script>\n      var a = "  ";\n    </script>', html
+        )
+
+
+class CompressionMiddlewareTest(SimpleTestCase):
+
+    def setUp(self):
+        caches[settings.COMPRESSION_CACHE_ALIAS].clear()
+        self.factory = RequestFactory()
+
+    def call(self, response, encoding='gzip, deflate', user=None, **meta):
+        middleware = CompressionMiddleware(lambda request: response)
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=encoding, **meta)
+        if user is not None:
+            request.user = user
+        return middleware(request)
+
+    def test_html_minified_and_compressed(self):
+        response = self.call(HttpResponse(PAGE))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            response['Content-Length'], str(len(response.content))
+        )
+        self.assertEqual(
+            gzip.decompress(response.content).decode(), minify_html(PAGE)
+        )
+
+    def test_identity(self):
+        for encoding in ('', 'gzip;q=0', 'identity'):
+            with self.subTest(encoding=encoding):
+                response = self.call(HttpResponse(PAGE), encoding)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(
+                    response.content.decode(), minify_html(PAGE)
+                )
+
+    @override_settings(HTML_MINIFY=False)
+    def test_minify_disabled(self):
+        response = self.call(HttpResponse(PAGE), '')
+        self.assertEqual(response.content.decode(), PAGE)
+
+    def test_json_compressed_not_minified(self):
+        data = {'text': 'a  b ' * 100}
+        response = self.call(JsonResponse(data))
+        self.assertEqual(
+            gzip.decompress(response.content),
+            JsonResponse(data).content
+        )
+
+    def test_skipped(self):
+        image = HttpResponse(b'\x00' * 1000, content_type='image/png')
+        small = HttpResponse('<p>  мало  </p>')
+        for response in (image, small):
+            with self.subTest(content_type=response['Content-Type']):
+                self.assertFalse(
+                    self.call(response).has_header('Content-Encoding')
+                )
+        self.assertEqual(small.content.decode(), '<p> мало </p>')
+
+    def test_weak_etag(self):
+        response = HttpResponse(PAGE)
+        response['ETag'] = '"abc"'
+        self.assertEqual(self.call(response)['ETag'], 'W/"abc"')
+
+    def test_compressed_once(self):
+        """одинаковые страницы сжимаются один раз"""
+        with mock.patch.object(
+            compression, 'compress', wraps=compression.compress
+        ) as compress:
+            first = self.call(HttpResponse(PAGE))
+            second = self.call(HttpResponse(PAGE))
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_personal_not_cached(self):
+        """страницы вошедших и с CSRF-токеном в кеш не попадают"""
+        cases = {
+            'user': {'user': User(username='reader')},
+            'csrf': {'CSRF_COOKIE_USED': True},
+        }
+        for name, attributes in cases.items():
+            with self.subTest(name=name), mock.patch.object(
+                compression, 'compress', wraps=compression.compress
+            ) as compress:
+                self.call(HttpResponse(PAGE), **attributes)
+                self.call(HttpResponse(PAGE), **attributes)
+                self.assertEqual(compress.call_count, 2)
+        self.call(HttpResponse(PAGE), user=AnonymousUser())
+        self.assertEqual(
+            len(caches[settings.COMPRESSION_CACHE_ALIAS]._cache), 1
+        )
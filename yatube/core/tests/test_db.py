@@ -0,0 +1,126 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase, override_settings
+
+from core.db import retry_on_lock
+
+ALIAS = 'stress'
+
+
+@override_settings(DATABASE_RETRY_DELAY=0.01)
+class SQLiteConcurrencyTest(SimpleTestCase):
+    """Несколько потоков пишут и читают один файл базы.
+
+    Отдельная база-файл: тестовая база в памяти не поддерживает WAL
+    и блокирует таблицы иначе.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[ALIAS] = {
+            **settings.DATABASES['default'],
+            'NAME': os.path.join(cls.directory, 'stress.sqlite3'),
+            'CONN_MAX_AGE': 0,
+        }
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER)'
+            )
+            cursor.execute('CREATE TABLE log (id INTEGER PRIMARY KEY)')
+            cursor.execute('INSERT INTO counter VALUES (1, 0)')
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[ALIAS].close()
+        del connections.databases[ALIAS]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def execute(self, sql, params=()):
+        with connections[ALIAS].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def test_pragmas(self):
+        self.assertEqual(self.execute('PRAGMA journal_mode'), [('wal',)])
+        # NORMAL
+        self.assertEqual(self.execute('PRAGMA synchronous'), [(1,)])
+        self.assertEqual(self.execute('PRAGMA busy_timeout'), [(5000,)])
+
+    @override_settings(DATABASE_WRITE_RETRIES=0)
+    def test_mixed_reads_and_writes(self):
+        """чтение и запись (сначала чтение) без ошибок и потерь
+
+        Хватает BEGIN IMMEDIATE и busy_timeout, без повторов.
+        """
+        errors = []
+        writes = 30
+
+        @retry_on_lock(using=ALIAS)
+        def increment():
+            # Чтение перед записью: с BEGIN DEFERRED здесь "locked".
+            (value,), = self.execute('SELECT value FROM counter')
+            self.execute('INSERT INTO log DEFAULT VALUES')
+            self.execute('UPDATE counter SET value = %s', [value + 1])
+
+        def worker():
+            try:
+                for _ in range(writes):
+                    self.execute('SELECT count(*) FROM log')
+                    increment()
+                    time.sleep(random.random() / 1000)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections[ALIAS].close()
+
+        (before,), = self.execute('SELECT value FROM counter')
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        (after,), = self.execute('SELECT value FROM counter')
+        self.assertEqual(after - before, 8 * writes)
+        self.assertEqual(
+            self.execute('SELECT count(*) FROM log'), [(after,)]
+        )
+
+    @override_settings(DATABASE_WRITE_RETRIES=2)
+    def test_retry_on_lock(self):
+        """повтор только при блокировке и не больше настройки"""
+        calls = []
+
+        @retry_on_lock(using=ALIAS)
+        def write(errors):
+            calls.append(1)
+            if len(calls) <= errors:
+                raise OperationalError('database is locked')
+            self.execute('INSERT INTO log DEFAULT VALUES')
+            return len(calls)
+
+        self.assertEqual(write(2), 3)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write(3)
+        self.assertEqual(len(calls), 3)
+
+        @retry_on_lock(using=ALIAS)
+        def broken():
+            calls.append(1)
+            raise OperationalError('no such table: missing')
+
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            broken()
+        self.assertEqual(len(calls), 1)
@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry, timer
+from posts.models import Post, User
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.metrics.InstrumentedCache',
+        'OPTIONS': {'CACHE': 'uninstrumented'},
+    },
+    'uninstrumented': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'metrics-tests',
+    },
+}
+
+
+# Без алиаса shared: сессии и пользователи - в базе, как в local.
+@override_settings(
+    METRICS_ENABLED=True, CACHES=CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.db',
+    AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+)
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Текст')
+        cls.staff = User.objects.create_user(
+            username='staff', is_staff=True
+        )
+
+    def setUp(self):
+        registry.clear()
+        cache.clear()
+        self.client = Client()
+
+    def timings(self, response):
+        return {
+            part.split(';')[0]: part
+            for part in response['Server-Timing'].split(', ')
+        }
+
+    def test_server_timing(self):
+        """заголовок Server-Timing с SQL, шаблонами, кешем и итогом"""
+        timings = self.timings(self.client.get(reverse('posts:index')))
+        self.assertEqual(set(timings), {'sql', 'tpl', 'cache', 'total'})
+        self.assertIn('desc="1 queries"', timings['sql'])
+        self.assertRegex(timings['tpl'], r'tpl;dur=\d+\.\d$')
+        self.assertRegex(timings['cache'], r'hit=0 miss=[1-9]')
+        timings = self.timings(self.client.get(reverse('posts:index')))
+        self.assertRegex(timings['cache'], r'hit=[1-9]\d* miss=0')
+
+    def test_summary_for_staff_only(self):
+        """сводка по именам URL видна только персоналу"""
+        for _ in range(3):
+            self.client.get(reverse('posts:index'))
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.staff)
+        summary = self.client.get(url).json()
+        index = summary['posts:index']
+        self.assertEqual(index['count'], 3)
+        self.assertEqual(index['queries']['max'], 1)
+        self.assertEqual(sum(index['histogram'].values()), 3)
+        self.assertGreater(index['cache_misses'], 0)
+
+    def test_timer(self):
+        """работа вне запроса попадает в окно таймера"""
+        for _ in range(2):
+            with timer('thumbnail'):
+                pass
+        thumbnail = registry.summary()['timers']['thumbnail']
+        self.assertEqual(thumbnail['count'], 2)
+        self.assertGreaterEqual(thumbnail['ms']['max'], 0)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        """выключенные замеры не добавляют заголовок и не копятся"""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        with timer('thumbnail'):
+            pass
+        self.assertEqual(registry.summary(), {})
+        self.client.force_login(self.staff)
+        self.assertEqual(
+            self.client.get(reverse('core:metrics')).status_code, 404
+        )
@@ -0,0 +1,69 @@
+import threading
+
+from django.db import transaction
+from django.http import Http404
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.parallel import gather
+from posts.models import Follow, Post, User
+
+
+def current_thread():
+    return threading.current_thread().name
+
+
+@override_settings(QUERY_THREADS=2)
+class GatherTest(TransactionTestCase):
+    # С YATUBE_REPLICAS чтения из пула идут в реплики.
+    databases = '__all__'
+
+    def test_calls_run_in_pool(self):
+        """вызовы кроме первого идут в пуле, порядок результатов прежний"""
+        first, second, third = gather(
+            current_thread, current_thread, current_thread
+        )
+        self.assertEqual(first, current_thread())
+        self.assertTrue(second.startswith('query'))
+        self.assertTrue(third.startswith('query'))
+
+    @override_settings(QUERY_THREADS=0)
+    def test_disabled(self):
+        self.assertEqual(
+            gather(current_thread, current_thread), [current_thread()] * 2
+        )
+
+    def test_sequential_in_transaction(self):
+        """в транзакции вызовы идут по очереди в текущем потоке"""
+        with transaction.atomic():
+            self.assertEqual(
+                gather(current_thread, current_thread),
+                [current_thread()] * 2
+            )
+
+    def test_errors_propagate(self):
+        """ошибка из пула поднимается в вызывающем потоке"""
+        def missing():
+            raise Http404
+        with self.assertRaises(Http404):
+            gather(current_thread, missing)
+
+    def test_profile_with_parallel_queries(self):
+        """профиль собирается из параллельных запросов"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Текст')
+        self.client.force_login(reader)
+        response = self.client.get(
+            reverse('posts:profile', args=[author.username])
+        )
+        self.assertEqual(response.context['author'], author)
+        self.assertTrue(response.context['following'])
+        self.assertEqual(list(response.context['page_obj']), [post])
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:profile', args=['nobody'])
+            ).status_code,
+            404
+        )
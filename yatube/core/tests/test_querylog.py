@@ -0,0 +1,58 @@
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from core import querylog
+from posts.models import Post, User
+
+
+class QueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(3):
+            author = User.objects.create_user(username=f'author{number}')
+            Post.objects.create(author=author, text='Текст')
+
+    def render_authors(self):
+        Template(
+            '{% for post in posts %}{{ post.author.username }}{% endfor %}'
+        ).render(Context({'posts': Post.objects.all()}))
+
+    @override_settings(QUERYLOG_STRICT=True)
+    def test_strict_duplicates_raise(self):
+        """N+1 в шаблоне в строгом режиме - ошибка с местом вызова"""
+        with self.assertRaises(querylog.DuplicateQueryError) as error:
+            with querylog.scope():
+                self.render_authors()
+        message = str(error.exception)
+        self.assertIn('FROM "auth_user"', message)
+        self.assertIn('template <unknown source>:1', message)
+        self.assertIn('core/tests/test_querylog.py', message)
+
+    @override_settings(QUERYLOG_STRICT=False)
+    def test_duplicates_logged(self):
+        """без строгого режима повторы пишутся в лог один раз"""
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            with querylog.scope():
+                self.render_authors()
+                self.render_authors()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('3 одинаковых запросов', logs.output[0])
+
+    def test_duplicates_only_within_scope(self):
+        """вне HTTP-запроса повторы не ищутся"""
+        self.render_authors()
+
+    def test_in_lists_share_shape(self):
+        """списки IN разной длины - одна форма запроса"""
+        self.assertEqual(
+            querylog.shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+            querylog.shape('SELECT 1 WHERE id IN (%s)')
+        )
+
+    @override_settings(QUERYLOG_SLOW_MS=0)
+    def test_slow_query_logged(self):
+        """медленный запрос пишется в лог с параметрами и местом вызова"""
+        with self.assertLogs('core.querylog', 'WARNING') as logs:
+            Post.objects.filter(text='медленно').exists()
+        self.assertIn("('медленно',", logs.output[0])
+        self.assertIn('test_slow_query_logged', logs.output[0])
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.management.commands.sync_replicas import sync
+from posts.models import Post, User
+
+ALIAS = 'replica'
+
+
+@override_settings(
+    DATABASE_REPLICAS=[ALIAS],
+    REPLICA_STICKY_SECONDS=60,
+    CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache'
+    }},
+    SESSION_ENGINE='django.contrib.sessions.backends.db',
+    AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Реплика - файл, отстающий от основной базы до sync()."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        connections.databases[ALIAS] = {
+            **settings.DATABASES[DEFAULT_DB_ALIAS],
+            'NAME': os.path.join(cls.directory, 'replica.sqlite3'),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[ALIAS].close()
+        del connections.databases[ALIAS]
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.synced = Post.objects.create(author=self.author, text='Старый')
+        self.client.force_login(self.author)
+        sync(ALIAS)
+        self.fresh = Post.objects.create(author=self.author, text='Новый')
+
+    def index(self):
+        return list(
+            self.client.get(reverse('posts:index')).context['page_obj']
+        )
+
+    def test_reads_from_replica_until_write(self):
+        """GET читает реплику, после записи клиент читает основную базу"""
+        self.assertEqual(self.index(), [self.synced])
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.fresh.id]),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertEqual(self.index(), [self.fresh, self.synced])
+
+    def test_sticky_window_expires(self):
+        self.client.cookies[settings.REPLICA_STICKY_COOKIE] = str(
+            time.time() - 1
+        )
+        self.assertEqual(self.index(), [self.synced])
+
+    def test_unsafe_requests_and_commands_read_primary(self):
+        """POST и код вне запроса читают основную базу"""
+        self.assertEqual(Post.objects.db, DEFAULT_DB_ALIAS)
+        self.assertEqual(Post.objects.count(), 2)
+        response = self.client.post(
+            reverse('posts:post_edit', args=[self.fresh.id]),
+            {'text': 'Правка'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Post.objects.get(id=self.fresh.id).text, 'Правка'
+        )
@@ -0,0 +1,145 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+
+from core.compression import accepted_encodings
+from core.static import StaticFilesApplication
+
+CSS = 'body { color: #333; }\n' * 50
+
+
+class StaticPipelineTest(SimpleTestCase):
+    """collectstatic собирает хешированные и сжатые копии файлов."""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.root)
+        os.makedirs(os.path.join(self.source, 'css'))
+        with open(os.path.join(self.source, 'css', 'site.css'), 'w') as f:
+            f.write(CSS)
+        with open(os.path.join(self.source, 'tiny.js'), 'w') as f:
+            f.write('1;')
+        settings = override_settings(
+            STATIC_ROOT=self.root, STATICFILES_DIRS=[self.source]
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def collect(self):
+        call_command(
+            'collectstatic', interactive=False, verbosity=0,
+            ignore_patterns=['admin'], stdout=StringIO()
+        )
+        # Манифест читается при создании хранилища.
+        staticfiles_storage._setup()
+
+    def manifest(self):
+        with open(os.path.join(self.root, 'staticfiles.json')) as file:
+            return json.load(file)['paths']
+
+    def test_hashed_and_compressed(self):
+        self.collect()
+        hashed = self.manifest()['css/site.css']
+        self.assertRegex(hashed, r'^css/site\.[0-9a-f]{12}\.css$')
+        for name in ('css/site.css', hashed):
+            with gzip.open(os.path.join(self.root, name + '.gz')) as file:
+                self.assertEqual(file.read().decode(), CSS)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.root, 'tiny.js.gz'))
+        )
+        self.assertEqual(static('css/site.css'), '/static/' + hashed)
+
+    def test_gzip_deterministic(self):
+        self.collect()
+        path = os.path.join(self.root, 'css/site.css.gz')
+        with open(path, 'rb') as file:
+            first = file.read()
+        self.collect()
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), first)
+
+    def test_unhashed_without_manifest(self):
+        """до collectstatic {% static %} отдаёт исходное имя"""
+        self.assertEqual(static('css/site.css'), '/static/css/site.css')
+
+    def call(self, path, method='GET', **headers):
+        application = StaticFilesApplication(self.fallback)
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method, **headers}
+        response = {}
+
+        def start_response(status, headers):
+            response['status'] = status
+            response['headers'] = dict(headers)
+
+        body = application(environ, start_response)
+        response['body'] = b''.join(body)
+        if hasattr(body, 'close'):
+            body.close()
+        return response
+
+    def fallback(self, environ, start_response):
+        start_response('404 Not Found', [])
+        return [b'django']
+
+    def test_serves_compressed(self):
+        self.collect()
+        hashed = '/static/' + self.manifest()['css/site.css']
+        response = self.call(hashed, HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(response['status'], '200 OK')
+        headers = response['headers']
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(response['body']).decode(), CSS)
+        self.assertEqual(
+            int(headers['Content-Length']), len(response['body'])
+        )
+
+    def test_serves_identity(self):
+        self.collect()
+        response = self.call(
+            '/static/css/site.css', HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )
+        self.assertNotIn('Content-Encoding', response['headers'])
+        self.assertEqual(response['body'].decode(), CSS)
+        self.assertEqual(
+            response['headers']['Cache-Control'], 'public, max-age=60'
+        )
+
+    def test_not_modified_and_head(self):
+        self.collect()
+        first = self.call('/static/css/site.css')
+        etag = first['headers']['ETag']
+        response = self.call('/static/css/site.css', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response['status'], '304 Not Modified')
+        self.assertEqual(response['body'], b'')
+        response = self.call('/static/css/site.css', 'HEAD')
+        self.assertEqual(response['status'], '200 OK')
+        self.assertEqual(response['body'], b'')
+        self.assertEqual(
+            response['headers']['Content-Length'], str(len(CSS))
+        )
+
+    def test_unknown_path_falls_through(self):
+        self.collect()
+        for path in ('/static/missing.css', '/posts/', '/static/'):
+            with self.subTest(path=path):
+                self.assertEqual(self.call(path)['body'], b'django')
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip;q=0.5, br;q=0, deflate'),
+            {'gzip', 'deflate'}
+        )
+        self.assertEqual(accepted_encodings(''), set())
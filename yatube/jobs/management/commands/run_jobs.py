@@ -0,0 +1,90 @@
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs import queue
+
+
+def create_executor(kind, workers):
+    if kind == 'thread':
+        return ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='jobs'
+        )
+    # spawn, а не fork: дочерний процесс не должен унаследовать
+    # открытые соединения с базой.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет задачи из очереди (jobs) в пуле потоков или '
+        'процессов. С --once выходит, когда готовых задач не осталось.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.JOBS_WORKERS
+        )
+        parser.add_argument(
+            '--executor', choices=('thread', 'process'),
+            default=settings.JOBS_EXECUTOR,
+            help='Потоки - для задач, ждущих базу и диск, процессы - '
+                 'для задач, занятых процессором (миниатюры).'
+        )
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        running = {}
+        stopping = False
+        with create_executor(options['executor'], workers) as executor:
+            while True:
+                try:
+                    free = workers - len(running)
+                    if free and not stopping:
+                        for task in queue.claim(free):
+                            future = executor.submit(
+                                queue.execute, task.name, task.arguments
+                            )
+                            running[future] = task, time.perf_counter()
+                    if not running:
+                        if stopping or options['once']:
+                            return
+                        time.sleep(settings.JOBS_POLL_INTERVAL)
+                        continue
+                    done, _ = wait(
+                        running, timeout=settings.JOBS_POLL_INTERVAL,
+                        return_when=FIRST_COMPLETED
+                    )
+                except KeyboardInterrupt:
+                    # Новые задачи не берём, начатые доводим до конца.
+                    stopping = True
+                    continue
+                for future in done:
+                    self.report(future, *running.pop(future))
+
+    def report(self, future, task, start):
+        error = future.exception()
+        if error is None:
+            queue.finish(task)
+            self.stdout.write(
+                f'{task}: {(time.perf_counter() - start) * 1000:.0f} мс'
+            )
+            return
+        queue.finish(task, ''.join(traceback.format_exception(
+            type(error), error, error.__traceback__
+        )))
+        self.stderr.write(
+            f'{task}: попытка {task.attempts}, {error!r} '
+            f'({task.get_status_display()})'
+        )
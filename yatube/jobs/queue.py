@@ -0,0 +1,103 @@
+"""Очередь фоновых задач в базе данных, без брокера.
+
+Задача - функция модуля с декоратором job, её ставят в очередь через
+func.delay(*args); аргументы должны сериализоваться в JSON. Строка
+задачи пишется в той же транзакции, что и данные, поэтому при откате
+задача тоже исчезает. Выполняет задачи команда run_jobs: claim()
+забирает готовые, execute() выполняет в пуле потоков или процессов,
+finish() удаляет выполненную или откладывает упавшую с
+экспоненциальной паузой.
+
+С JOBS_EAGER задача выполняется сразу при постановке (тесты,
+разработка без воркера).
+"""
+import json
+import random
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.db import retry_on_lock
+
+from .models import Job
+
+
+def job(func):
+    """Делает функцию задачей: func.delay(*args) ставит её в очередь."""
+    func.delay = partial(enqueue, f'{func.__module__}.{func.__qualname__}')
+    return func
+
+
+def enqueue(name, *args):
+    """Задача в очереди или None, если она уже выполнена (JOBS_EAGER)."""
+    if settings.JOBS_EAGER:
+        import_string(name)(*args)
+        return None
+    return Job.objects.create(name=name, args=json.dumps(args))
+
+
+@retry_on_lock
+def claim(limit):
+    """Забирает до limit готовых задач и помечает их выполняемыми.
+
+    Задача, взятая воркером больше JOBS_LOCK_TIMEOUT секунд назад,
+    считается брошенной (воркер упал) и выдаётся снова.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    # На SQLite select_for_update ничего не делает: конкурирующие
+    # воркеры разделяет BEGIN IMMEDIATE (core.db.sqlite3).
+    jobs = list(
+        Job.objects.select_for_update(skip_locked=True).filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_at__lt=stale)
+        ).order_by('run_at', 'id')[:limit]
+    )
+    Job.objects.filter(id__in=[task.id for task in jobs]).update(
+        status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1
+    )
+    for task in jobs:
+        task.status, task.locked_at = Job.RUNNING, now
+        task.attempts += 1
+    return jobs
+
+
+def execute(name, args):
+    """Выполняет задачу; вызывается в пуле воркера.
+
+    Транзакцию задача открывает сама, если она нужна: с BEGIN IMMEDIATE
+    долгая задача в транзакции держала бы блокировку записи.
+    """
+    try:
+        import_string(name)(*args)
+    finally:
+        close_old_connections()
+
+
+def retry_delay(attempts):
+    return (
+        settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+        * random.uniform(0.5, 1.5)
+    )
+
+
+@retry_on_lock
+def finish(task, error=''):
+    """Удаляет выполненную задачу, упавшую - откладывает или бросает."""
+    if not error:
+        Job.objects.filter(id=task.id).delete()
+        return
+    task.error, task.locked_at = error, None
+    if task.attempts >= settings.JOBS_MAX_ATTEMPTS:
+        task.status = Job.FAILED
+    else:
+        task.status = Job.QUEUED
+        task.run_at = timezone.now() + timedelta(
+            seconds=retry_delay(task.attempts)
+        )
+    task.save(update_fields=['status', 'run_at', 'locked_at', 'error'])
@@ -0,0 +1,135 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs import queue
+from jobs.models import Job
+from posts.models import Follow, Post, TimelineEntry, User
+
+calls = []
+
+
+@queue.job
+def remember(*args):
+    calls.append(args)
+
+
+@queue.job
+def broken():
+    raise ValueError('сломано')
+
+
+@override_settings(JOBS_EAGER=False, JOBS_MAX_ATTEMPTS=2)
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_stores_job(self):
+        """delay пишет имя функции и аргументы, не выполняя её"""
+        job = remember.delay(1, 'два')
+        self.assertEqual(job.name, 'jobs.tests.test_queue.remember')
+        self.assertEqual(job.arguments, [1, 'два'])
+        self.assertEqual(calls, [])
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        self.assertIsNone(remember.delay(1))
+        self.assertEqual(calls, [(1,)])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim(self):
+        """выдаются только готовые задачи, каждая один раз"""
+        ready = remember.delay()
+        Job.objects.filter(id=remember.delay().id).update(
+            run_at=timezone.now() + timedelta(hours=1)
+        )
+        (job,) = queue.claim(10)
+        self.assertEqual(job.id, ready.id)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(queue.claim(10), [])
+
+    def test_abandoned_job_is_claimed_again(self):
+        job = remember.delay()
+        queue.claim(1)
+        Job.objects.filter(id=job.id).update(
+            locked_at=timezone.now() - timedelta(hours=1)
+        )
+        (job,) = queue.claim(1)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_with_backoff(self):
+        """упавшая задача откладывается, после JOBS_MAX_ATTEMPTS - failed"""
+        job = broken.delay()
+        (job,) = queue.claim(1)
+        queue.finish(job, 'ValueError')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(job.error, 'ValueError')
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        (job,) = queue.claim(1)
+        queue.finish(job, 'ValueError')
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(queue.claim(1), [])
+
+    def test_finished_job_is_deleted(self):
+        remember.delay()
+        (job,) = queue.claim(1)
+        queue.finish(job)
+        self.assertFalse(Job.objects.exists())
+
+    def test_timeline_waits_for_worker(self):
+        """публикация не раскладывает пост по лентам сама"""
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        post = Post.objects.create(author=author, text='Текст')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(
+            set(Job.objects.values_list('name', flat=True)),
+            {'posts.timeline.fan_out_job', 'posts.timeline.backfill_job'}
+        )
+        for job in queue.claim(10):
+            queue.execute(job.name, job.arguments)
+            queue.finish(job)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(reader.id, post.id)]
+        )
+
+    def test_backfill_skipped_after_unfollow(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Post.objects.create(author=author, text='Текст')
+        Follow.objects.create(user=reader, author=author).delete()
+        for job in queue.claim(10):
+            queue.execute(job.name, job.arguments)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_DELAY=60)
+class RunJobsCommandTest(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_once(self):
+        """run_jobs --once выполняет готовые задачи в пуле и выходит"""
+        for number in range(3):
+            remember.delay(number)
+        broken.delay()
+        stdout, stderr = StringIO(), StringIO()
+        call_command(
+            'run_jobs', '--once', '--workers', '2',
+            stdout=stdout, stderr=stderr
+        )
+        self.assertEqual(sorted(calls), [(0,), (1,), (2,)])
+        (job,) = Job.objects.all()
+        self.assertEqual(job.name, 'jobs.tests.test_queue.broken')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError: сломано', job.error)
+        self.assertIn('попытка 1', stderr.getvalue())
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post
 
 
@@ -16,6 +17,15 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     list_editable = ('group',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%...%' по всей таблице.
+        query_words = search.words(search_term)
+        if not query_words:
+            return queryset, False
+        return queryset.filter(
+            id__in=search.get_index().post_ids(query_words)
+        ), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,123 @@
+"""Условные GET-запросы к HTML-лентам.
+
+Для каждой ленты в кеше хранится метка последнего изменения: её
+сдвигают сигналы постов, групп, авторов и подписок, поэтому проверка
+If-None-Match/If-Modified-Since не ходит в базу. Если метки нет
+(кеш очищен, вытеснен или истёк срок), она заводится текущим
+временем - клиент один раз получит полный ответ, но устаревшую
+страницу не увидит.
+
+Метки живут FEED_CHANGED_TIMEOUT секунд. С общим файловым кешем
+(YATUBE_CACHE=shared) изменение видно всем воркерам сразу, с tiered -
+после сверки журнала ключей (SYNC_INTERVAL, core.cache), с кешем
+в памяти процесса другие воркеры узнают о нём, когда их метка истечёт.
+
+Ключи - slug группы и username автора, как в URL, чтобы не искать
+группу или автора до проверки.
+"""
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .constants import (FEED_CHANGED_CACHE_KEY, FEED_CHANGED_TIMEOUT,
+                        FEED_MAX_AGE, FEED_SHARED_MAX_AGE)
+
+# Метка для изменений, задевающих карточки во всех лентах сразу.
+ALL = 'all'
+INDEX = 'index'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def _key(scope):
+    return FEED_CHANGED_CACHE_KEY.format(scope=scope)
+
+
+def touch(*scopes, when=None):
+    """Отмечает изменение лент."""
+    when = when or timezone.now()
+    cache.set_many(
+        {_key(scope): when for scope in scopes}, FEED_CHANGED_TIMEOUT
+    )
+
+
+def touch_post(post):
+    """Пост появился, изменился или удалён."""
+    scopes = [INDEX, author_scope(post.author.username)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    touch(*scopes)
+
+
+def last_changed(*scopes):
+    """Время последнего изменения лент из scopes (и общей метки)."""
+    scopes = (ALL, *scopes)
+    found = cache.get_many([_key(scope) for scope in scopes])
+    missing = [scope for scope in scopes if _key(scope) not in found]
+    if missing:
+        now = timezone.now()
+        touch(*missing, when=now)
+        found[_key(missing[0])] = now
+    return max(found.values())
+
+
+def index_changed(request):
+    return last_changed(INDEX)
+
+
+def group_changed(request, slug):
+    return last_changed(group_scope(slug))
+
+
+def profile_changed(request, username):
+    return last_changed(author_scope(username))
+
+
+def conditional_feed(changed):
+    """ETag и Last-Modified по метке ленты плюс заголовки кеширования.
+
+    Анонимные ответы можно хранить в общих кешах (Vary: Cookie отделяет
+    вошедших пользователей), ответы вошедшим - только в браузере:
+    в них кнопка подписки и имя пользователя.
+    """
+    def last_modified(request, *args, **kwargs):
+        if not hasattr(request, 'feed_changed'):
+            request.feed_changed = changed(request, *args, **kwargs)
+        return request.feed_changed
+
+    def etag(request, *args, **kwargs):
+        stamp = last_modified(request, *args, **kwargs).timestamp()
+        return f'{stamp}-{request.user.pk or 0}'
+
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag, last_modified_func=last_modified
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response,
+                    public=True,
+                    max_age=FEED_MAX_AGE,
+                    s_maxage=FEED_SHARED_MAX_AGE
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        return wrapper
+
+    return decorator
@@ -1,2 +1,40 @@
 PAGINATOR_COUNT = 10
 MAX_CHAR_LENGTH = 15
+CURSOR_PARAM = 'cursor'
+COMMENTS_PER_PAGE = 20
+# Авторы с таким числом подписчиков не раскладываются по лентам
+# при публикации: их посты читаются напрямую при показе ленты.
+TIMELINE_PULL_FOLLOWERS = 10000
+TIMELINE_PULL_CACHE_KEY = 'timeline_pull_authors'
+TIMELINE_PULL_CACHE_TIMEOUT = 300
+TIMELINE_BATCH_SIZE = 1000
+# Имя фрагмента карточки поста в posts/includes/post.html.
+POST_CARD_FRAGMENT = 'post_card'
+POST_IMAGE_GEOMETRY = '960x339'
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширины адаптивных вариантов картинки для srcset, пропорции те же,
+# что у POST_IMAGE_GEOMETRY.
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# Дополнительные форматы вариантов, если их поддерживает Pillow.
+POST_IMAGE_EXTRA_FORMATS = ('AVIF', 'WEBP')
+POST_IMAGE_SIZES = '(max-width: 960px) 100vw, 960px'
+THUMBNAIL_WORKERS = 2
+POST_IMAGE_MAX_SIZE = 5 * 1024 * 1024
+POST_IMAGE_MAX_SIDE = 10000
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+SEARCH_PARAM = 'q'
+SEARCH_MAX_TERMS = 8
+# Веса полей документа поиска: заголовок группы важнее текста,
+# совпадение в комментариях - слабее.
+SEARCH_WEIGHTS = {'text': 1.0, 'group_title': 2.0, 'comments': 0.5}
+SEARCH_SNIPPET_WORDS = 12
+FEED_CHANGED_CACHE_KEY = 'feed_changed:{scope}'
+# Браузер сверяется с сервером при каждом показе ленты, общий кеш
+# (прокси) может отдавать анонимным читателям копию до минуты.
+FEED_MAX_AGE = 0
+FEED_SHARED_MAX_AGE = 60
+# Сколько живёт метка изменения ленты. В памяти процесса метка другого
+# воркера не сдвигается, поэтому устаревший 304 возможен не дольше,
+# чем общий кеш и так хранит копию ленты.
+FEED_CHANGED_TIMEOUT = FEED_SHARED_MAX_AGE
@@ -1,6 +1,39 @@
+from functools import partial
+
 from django import forms
+from django.core.exceptions import ValidationError
+from PIL import Image
 
 from .models import Post, Comment
+from .validators import IMAGE_TOO_LARGE
+
+
+def image_from_header(field, data):
+    """to_python для forms.ImageField, читающий только заголовок.
+
+    forms.ImageField вызывает verify() и разбирает весь файл. Здесь
+    Image.open читает заголовок, а формат и размеры по нему проверяет
+    validate_post_image модели.
+    """
+    file = forms.FileField.to_python(field, data)
+    if file is None:
+        return None
+    if hasattr(data, 'temporary_file_path'):
+        source = data.temporary_file_path()
+    else:
+        source = data
+        source.seek(0)
+    try:
+        with Image.open(source) as image:
+            file.image = image
+            file.content_type = Image.MIME.get(image.format)
+    except (OSError, Image.DecompressionBombError) as error:
+        raise ValidationError(
+            field.error_messages['invalid_image'], code='invalid_image'
+        ) from error
+    if hasattr(file, 'seek') and callable(file.seek):
+        file.seek(0)
+    return file
 
 
 class PostForm(forms.ModelForm):
@@ -8,6 +41,25 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def __init__(self, data=None, files=None, *args,
+                 image_too_large=False, **kwargs):
+        # Загрузку оборвал PostImageUploadHandler: форма связана, даже
+        # если до картинки в теле запроса не дошло ни одного поля.
+        if image_too_large and data is None:
+            data = {}
+        super().__init__(data, files, *args, **kwargs)
+        self.image_too_large = image_too_large
+        # Поле остаётся forms.ImageField (виджет, сообщения), меняется
+        # только разбор файла.
+        image = self.fields['image']
+        image.to_python = partial(image_from_header, image)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_too_large:
+            self.add_error('image', IMAGE_TOO_LARGE)
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,136 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import ASGIHandler, wsgi_environ
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает WSGI и ASGI-обёртку (core.asgi) под медленными '
+        'клиентами в одном процессе: одинаковое число потоков для view, '
+        'отдача ответа клиенту занимает --send-delay мс. В WSGI поток '
+        'ждёт клиента, в ASGI - нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--clients', type=int, default=100,
+                            help='Одновременных соединений.')
+        parser.add_argument('--requests', type=int, default=5,
+                            help='Запросов на клиента подряд.')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Потоков для view в обоих режимах.')
+        parser.add_argument('--send-delay', type=float, default=50,
+                            help='Время отдачи ответа клиенту, мс.')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        self.application = get_wsgi_application()
+        self.delay = options['send_delay'] / 1000
+        path, query = (options['path'].split('?', 1) + [''])[:2]
+        self.scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': path,
+            'query_string': query.encode(),
+            'headers': [(b'host', b'localhost')],
+        }
+        total = options['clients'] * options['requests']
+        results = {}
+        for mode, bench in (('wsgi', self.wsgi), ('asgi', self.asgi)):
+            start = time.perf_counter()
+            latencies = bench(options)
+            elapsed = time.perf_counter() - start
+            results[mode] = {
+                'requests': total,
+                'rps': round(total / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+                'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+            }
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode}: {result["rps"]} запросов/с, '
+                f'p50 {result["p50_ms"]} мс, p95 {result["p95_ms"]} мс'
+            )
+
+    def wsgi(self, options):
+        """Клиенты-потоки, пул воркеров отдаёт ответ сам."""
+        workers = ThreadPoolExecutor(max_workers=options['threads'])
+        latencies = []
+        lock = threading.Lock()
+
+        def serve():
+            environ = wsgi_environ(self.scope, BytesIO())
+
+            def start_response(status, headers, exc_info=None):
+                pass
+
+            response = self.application(environ, start_response)
+            try:
+                for _ in response:
+                    # Запись в сокет медленного клиента блокирует воркер.
+                    time.sleep(self.delay)
+            finally:
+                response.close()
+
+        def client():
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                workers.submit(serve).result()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+
+        clients = [
+            threading.Thread(target=client)
+            for _ in range(options['clients'])
+        ]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        workers.shutdown()
+        return latencies
+
+    def asgi(self, options):
+        """Клиенты-корутины, ответ отдаёт цикл событий."""
+        handler = ASGIHandler(self.application, options['threads'])
+        latencies = []
+
+        async def receive():
+            return {'type': 'http.request'}
+
+        async def send(message):
+            if message.get('body'):
+                await asyncio.sleep(self.delay)
+
+        async def client():
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                await handler(self.scope, receive, send)
+                latencies.append(time.perf_counter() - start)
+
+        async def main():
+            await asyncio.gather(
+                *(client() for _ in range(options['clients']))
+            )
+
+        asyncio.run(main())
+        handler.executor.shutdown()
+        return latencies
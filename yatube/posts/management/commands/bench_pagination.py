@@ -0,0 +1,78 @@
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts.constants import PAGINATOR_COUNT
+from posts.models import Post, User
+from posts.utils import CursorPaginator
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время выборки первой и глубокой страницы ленты '
+        'для OFFSET-пагинатора и пагинатора по курсору. '
+        'Тестовые данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        page = options['page']
+        with transaction.atomic():
+            self.fill(page * PAGINATOR_COUNT)
+            queryset = Post.objects.select_related('author', 'group')
+            for number in (1, page):
+                offset_time = self.measure(
+                    lambda: list(
+                        Paginator(queryset.order_by('-pub_date', '-id'),
+                                  PAGINATOR_COUNT).page(number)
+                    ),
+                    options['repeat']
+                )
+                cursor = self.cursor_for(queryset, number)
+                cursor_time = self.measure(
+                    lambda: list(
+                        CursorPaginator(queryset, PAGINATOR_COUNT)
+                        .get_page(cursor)
+                    ),
+                    options['repeat']
+                )
+                self.stdout.write(
+                    f'страница {number}: OFFSET {offset_time:.2f} мс, '
+                    f'курсор {cursor_time:.2f} мс'
+                )
+            transaction.set_rollback(True)
+
+    def fill(self, total):
+        author = User.objects.create(username='bench_pagination_author')
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Пост {number}')
+                for number in range(start, min(start + BATCH_SIZE, total))
+            )
+
+    def cursor_for(self, queryset, number):
+        """Курсор, ведущий на страницу number (строится вне замера)."""
+        if number == 1:
+            return None
+        paginator = CursorPaginator(queryset, PAGINATOR_COUNT)
+        last = queryset.order_by(*paginator.ordering)[
+            (number - 1) * PAGINATOR_COUNT - 1
+        ]
+        return paginator.encode_cursor(False, last)
+
+    def measure(self, func, repeat):
+        """Лучшее время из repeat запусков в миллисекундах."""
+        best = None
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            elapsed = (perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
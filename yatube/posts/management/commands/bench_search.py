@@ -0,0 +1,133 @@
+import random
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Q
+
+from posts.constants import PAGINATOR_COUNT
+from posts.models import Comment, Group, Post, User
+from posts.search import SearchResults, fts_enabled, rebuild
+
+BATCH_SIZE = 5000
+VOCABULARY_SIZE = 20000
+GROUPS = 100
+WORDS_PER_POST = 30
+# Комментарии обсуждаемого поста: новый комментарий к нему индексируется
+# за время, не зависящее от их числа.
+COMMENTS_PER_POST = 1000
+# Редкое слово встречается примерно в 0.05% постов, частое - в 10%.
+RARE_WORD, COMMON_WORD = 'мерцание', 'вечер'
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск по индексу с LIKE по тексту и названию группы. '
+        'Тестовые данные создаются в транзакции и откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        vocabulary = [f'слово{number}' for number in range(VOCABULARY_SIZE)]
+        with transaction.atomic():
+            start = perf_counter()
+            self.fill(options['posts'], vocabulary)
+            self.stdout.write(
+                f'постов: {options["posts"]}, '
+                f'заполнение {perf_counter() - start:.1f} с'
+            )
+            start = perf_counter()
+            rebuild()
+            backend = 'FTS5' if fts_enabled() else 'SearchTerm'
+            self.stdout.write(
+                f'индекс {backend}: {perf_counter() - start:.1f} с'
+            )
+            queries = (RARE_WORD, COMMON_WORD, f'{COMMON_WORD} {RARE_WORD}')
+            for query in queries:
+                like_time = self.measure(
+                    lambda: self.like_page(query), options['repeat']
+                )
+                index_time = self.measure(
+                    lambda: self.index_page(query), options['repeat']
+                )
+                self.stdout.write(
+                    f'«{query}»: LIKE {like_time:.2f} мс, '
+                    f'индекс {index_time:.2f} мс'
+                )
+            comment_time = self.measure(
+                lambda: self.comment(vocabulary), options['repeat']
+            )
+            self.stdout.write(
+                f'комментарий к посту с {COMMENTS_PER_POST} '
+                f'комментариями: {comment_time:.2f} мс'
+            )
+            transaction.set_rollback(True)
+
+    def fill(self, total, vocabulary):
+        self.author = User.objects.create(username='bench_search_author')
+        groups = Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'bench-search-{number}',
+                  description='')
+            for number in range(GROUPS)
+        )
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    author=self.author,
+                    group=random.choice(groups),
+                    text=self.text(vocabulary)
+                )
+                for _ in range(start, min(start + BATCH_SIZE, total))
+            )
+        self.post = Post.objects.latest('id')
+        Comment.objects.bulk_create(
+            Comment(
+                post=self.post, author=self.author,
+                text=self.text(vocabulary)
+            )
+            for _ in range(COMMENTS_PER_POST)
+        )
+
+    def comment(self, vocabulary):
+        Comment.objects.create(
+            post=self.post, author=self.author, text=self.text(vocabulary)
+        )
+
+    def text(self, vocabulary):
+        words = random.choices(vocabulary, k=WORDS_PER_POST)
+        if random.random() < 0.0005:
+            words[0] = RARE_WORD
+        if random.random() < 0.1:
+            words[-1] = COMMON_WORD
+        return ' '.join(words)
+
+    def like_page(self, query):
+        condition = Q()
+        for word in query.split():
+            condition &= (
+                Q(text__icontains=word) | Q(group__title__icontains=word)
+            )
+        paginator = Paginator(
+            Post.objects.for_listing().filter(condition), PAGINATOR_COUNT
+        )
+        return list(paginator.page(1)), paginator.count
+
+    def index_page(self, query):
+        paginator = Paginator(SearchResults(query.split()), PAGINATOR_COUNT)
+        return list(paginator.page(1)), paginator.count
+
+    def measure(self, func, repeat):
+        """Лучшее время из repeat запусков в миллисекундах."""
+        best = None
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            elapsed = (perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,207 @@
+import copy
+import json
+import statistics
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template import TemplateDoesNotExist
+from django.template.utils import EngineHandler
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from posts import search
+from posts.constants import PAGINATOR_COUNT
+from posts.forms import CommentForm, PostForm
+from posts.models import Group, Post, UserStats
+from posts.timeline import TimelinePaginator
+from posts.utils import comment_pagination, pagination
+
+from .bench_views import percentile
+
+TEMPLATES = (
+    'posts/index.html',
+    'posts/group_list.html',
+    'posts/profile.html',
+    'posts/post_detail.html',
+    'posts/includes/comments.html',
+    'posts/follow.html',
+    'posts/search.html',
+    'posts/create_post.html',
+)
+
+
+def engine_configs():
+    """Движки для сравнения: имя - список TEMPLATES."""
+    uncached = copy.deepcopy(settings.DJANGO_TEMPLATES)
+    uncached['OPTIONS']['loaders'] = settings.TEMPLATE_LOADERS
+    cached = copy.deepcopy(uncached)
+    cached['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', settings.TEMPLATE_LOADERS)
+    ]
+    configs = {'django': [uncached], 'django-cached': [cached]}
+    try:
+        import jinja2  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        configs['jinja2'] = [settings.JINJA2_TEMPLATES, cached]
+    return configs
+
+
+class Command(BaseCommand):
+    help = (
+        'Время рендера шаблонов страниц постов на разных движках: '
+        'Django без кеша шаблонов, Django с cached loader и Jinja2 '
+        '(если установлен). Контекст собирается заранее из текущей '
+        'базы, в замер входит только render.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--templates', nargs='+', choices=TEMPLATES,
+                            default=list(TEMPLATES))
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым рендером: карточки постов '
+                 'рендерятся заново, а не берутся из кеша фрагментов.'
+        )
+        parser.add_argument('--json', metavar='PATH',
+                            help='Записать результат в JSON ("-" - stdout).')
+
+    def handle(self, *args, **options):
+        self.cold = options['cold']
+        contexts = self.contexts()
+        results = {}
+        for name, templates in engine_configs().items():
+            engines = EngineHandler(templates)
+            for template_name in options['templates']:
+                request, context = contexts[template_name]
+                for _ in range(options['warmup']):
+                    self.timed(engines, template_name, context, request)
+                timings = [
+                    self.timed(engines, template_name, context, request)
+                    for _ in range(options['renders'])
+                ]
+                results.setdefault(template_name, {})[name] = {
+                    'p50_ms': round(percentile(timings, 0.5), 3),
+                    'p95_ms': round(percentile(timings, 0.95), 3),
+                    'mean_ms': round(statistics.mean(timings), 3),
+                }
+        self.report(results, options)
+
+    def get_template(self, engines, template_name):
+        for engine in engines.all():
+            try:
+                return engine.get_template(template_name)
+            except TemplateDoesNotExist:
+                pass
+        raise CommandError(f'Шаблон {template_name} не найден.')
+
+    def request(self, user, viewname, *args):
+        path = reverse(viewname, args=args)
+        request = RequestFactory().get(path)
+        request.user = user
+        request.resolver_match = resolve(path)
+        return request
+
+    def contexts(self):
+        """Запрос и контекст каждого шаблона, с уже выполненным SQL."""
+        post = Post.objects.for_detail().order_by('-comment_count').first()
+        group = Group.objects.first()
+        reader = UserStats.objects.select_related('user').order_by(
+            '-following_count'
+        ).first()
+        if post is None or group is None or reader is None:
+            raise CommandError('В базе нет данных: запустите generate_data.')
+        author = post.author
+        guest = AnonymousUser()
+        # Первая страница лент и комментариев.
+        first_page = self.request(guest, 'posts:index')
+        word = search.words(post.text)[:1]
+        results = Paginator(search.SearchResults(word), PAGINATOR_COUNT)
+        return {
+            'posts/index.html': (
+                self.request(guest, 'posts:index'),
+                pagination(Post.objects.for_listing(), first_page)
+            ),
+            'posts/group_list.html': (
+                self.request(guest, 'posts:group_list', group.slug),
+                {'group': group, **pagination(
+                    group.posts.for_listing(), first_page
+                )}
+            ),
+            'posts/profile.html': (
+                self.request(
+                    reader.user, 'posts:profile', author.username
+                ),
+                {'author': author, 'following': False, **pagination(
+                    author.posts.for_listing(), first_page
+                )}
+            ),
+            'posts/post_detail.html': (
+                self.request(reader.user, 'posts:post_detail', post.id),
+                {
+                    'post': post,
+                    'form': CommentForm(),
+                    'comments': comment_pagination(post.id, first_page),
+                }
+            ),
+            'posts/includes/comments.html': (
+                self.request(guest, 'posts:post_comments', post.id),
+                {
+                    'comments': comment_pagination(post.id, first_page),
+                    'post_id': post.id,
+                    'fragment': True,
+                }
+            ),
+            'posts/follow.html': (
+                self.request(reader.user, 'posts:follow_index'),
+                {'page_obj': TimelinePaginator(
+                    reader.user, PAGINATOR_COUNT
+                ).get_page(None)}
+            ),
+            'posts/search.html': (
+                self.request(guest, 'posts:search'),
+                {'query': ' '.join(word), 'page_obj': results.get_page(1)}
+            ),
+            'posts/create_post.html': (
+                self.request(reader.user, 'posts:post_create'),
+                {'form': PostForm()}
+            ),
+        }
+
+    def timed(self, engines, template_name, context, request):
+        """Время поиска и рендера шаблона, как в render() из view, мс."""
+        if self.cold:
+            cache.clear()
+        start = perf_counter()
+        template = self.get_template(engines, template_name)
+        # Копия: бэкенд Jinja2 дописывает в контекст request и csrf.
+        template.render(dict(context), request)
+        return (perf_counter() - start) * 1000
+
+    def report(self, results, options):
+        if options['json']:
+            data = json.dumps({
+                'options': {
+                    name: options[name]
+                    for name in ('renders', 'warmup', 'cold')
+                },
+                'templates': results,
+            }, ensure_ascii=False, indent=2)
+            if options['json'] == '-':
+                self.stdout.write(data)
+                return
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                file.write(data)
+        for template_name, engines in results.items():
+            self.stdout.write(template_name + ': ' + ', '.join(
+                f'{name} p50 {result["p50_ms"]} мс / '
+                f'p95 {result["p95_ms"]} мс'
+                for name, result in engines.items()
+            ))
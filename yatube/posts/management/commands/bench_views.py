@@ -0,0 +1,170 @@
+import json
+import random
+import statistics
+import tracemalloc
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post, UserStats
+
+VIEWS = ('index', 'group_list', 'profile', 'post_detail', 'follow_index')
+SAMPLE_SIZE = 200
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц через тестовый клиент Django: '
+        'p50/p95 времени ответа, число SQL-запросов и пик памяти '
+        'на запрос. Данные - текущая база (см. generate_data).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--profile-requests', type=int, default=10,
+            help='Запросов на подсчёт SQL и памяти (отдельно от замера '
+                 'времени: tracemalloc сильно замедляет код).'
+        )
+        parser.add_argument('--views', nargs='+', choices=VIEWS,
+                            default=list(VIEWS))
+        parser.add_argument('--cold', action='store_true',
+                            help='Очищать кеш перед каждым запросом.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', metavar='PATH',
+                            help='Записать результат в JSON ("-" - stdout).')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.cold = options['cold']
+        self.prepare()
+        results = {}
+        for view in options['views']:
+            urls = [self.url(view) for _ in range(options['requests'])]
+            for url in urls[:options['warmup']]:
+                self.request(url)
+            timings = [self.timed(url) for url in urls]
+            queries, memory = self.profile(
+                urls[:options['profile_requests']]
+            )
+            results[view] = {
+                'requests': len(timings),
+                'p50_ms': round(percentile(timings, 0.5), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'max_ms': round(max(timings), 2),
+                'queries': round(statistics.mean(queries), 1),
+                'peak_memory_kb': round(max(memory) / 1024, 1),
+            }
+        self.report(results, options)
+
+    def prepare(self):
+        last = Post.objects.aggregate(last=Max('id'))['last']
+        if last is None:
+            raise CommandError('В базе нет постов: запустите generate_data.')
+        post_ids = [
+            self.random.randint(1, last) for _ in range(SAMPLE_SIZE)
+        ]
+        posts = Post.objects.select_related('author').only(
+            'id', 'author__username'
+        )
+        # Случайные id вместо ORDER BY RANDOM(): без полного сканирования.
+        posts = (
+            list(posts.filter(id__in=post_ids))
+            or list(posts.order_by('-id')[:SAMPLE_SIZE])
+        )
+        self.post_ids = [post.id for post in posts]
+        self.usernames = [post.author.username for post in posts]
+        self.slugs = list(
+            Group.objects.values_list('slug', flat=True)[:SAMPLE_SIZE]
+        )
+        # Лента подписок самого активного читателя - худший случай.
+        reader = UserStats.objects.select_related('user').order_by(
+            '-following_count'
+        ).first()
+        self.guest = Client()
+        self.reader = Client()
+        if reader is not None:
+            self.reader.force_login(reader.user)
+
+    def url(self, view):
+        if view == 'group_list':
+            if not self.slugs:
+                raise CommandError('В базе нет групп.')
+            return self.guest, reverse(
+                'posts:group_list', args=[self.random.choice(self.slugs)]
+            )
+        if view == 'profile':
+            return self.guest, reverse(
+                'posts:profile', args=[self.random.choice(self.usernames)]
+            )
+        if view == 'post_detail':
+            return self.guest, reverse(
+                'posts:post_detail', args=[self.random.choice(self.post_ids)]
+            )
+        if view == 'follow_index':
+            return self.reader, reverse('posts:follow_index')
+        return self.guest, reverse('posts:index')
+
+    def request(self, url):
+        client, path = url
+        if self.cold:
+            cache.clear()
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path}: ответ {response.status_code}')
+        return response
+
+    def timed(self, url):
+        start = perf_counter()
+        self.request(url)
+        return (perf_counter() - start) * 1000
+
+    def profile(self, urls):
+        """Число запросов и пик памяти (байт) на каждый запрос."""
+        queries, memory = [], []
+        tracemalloc.start()
+        try:
+            for url in urls:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+                with CaptureQueriesContext(connection) as captured:
+                    self.request(url)
+                queries.append(len(captured))
+                memory.append(tracemalloc.get_traced_memory()[1] - base)
+        finally:
+            tracemalloc.stop()
+        return queries, memory
+
+    def report(self, results, options):
+        if options['json']:
+            data = json.dumps({
+                'options': {
+                    name: options[name]
+                    for name in ('requests', 'warmup', 'cold', 'seed')
+                },
+                'views': results,
+            }, ensure_ascii=False, indent=2)
+            if options['json'] == '-':
+                self.stdout.write(data)
+                return
+            with open(options['json'], 'w', encoding='utf-8') as file:
+                file.write(data)
+        for view, result in results.items():
+            self.stdout.write(
+                f'{view}: p50 {result["p50_ms"]} мс, '
+                f'p95 {result["p95_ms"]} мс, '
+                f'запросов {result["queries"]}, '
+                f'память {result["peak_memory_kb"]} КБ'
+            )
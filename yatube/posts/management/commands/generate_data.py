@@ -0,0 +1,195 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from itertools import accumulate, islice
+from time import perf_counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from posts import search, stats, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+SENTENCE_POOL = 5000
+# Популярность авторов по закону Ципфа: вес автора ранга r - 1 / r^s.
+AUTHOR_SKEW = 0.7
+GROUP_SHARE = 0.7
+# Пароль всех созданных пользователей, хеш считается один раз.
+PASSWORD = 'yatube'
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now/auto_now_add: даты задаёт генератор."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу правдоподобными пользователями, группами, постами, '
+        'подписками и комментариями через bulk_create, затем пересчитывает '
+        'счётчики, ленты подписок и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--follows', type=int, default=10_000_000)
+        parser.add_argument('--comments', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.faker = Faker('ru_RU')
+        self.faker.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.period = timedelta(days=options['days']).total_seconds()
+        self.sentences = [
+            self.faker.sentence() for _ in range(SENTENCE_POOL)
+        ]
+
+        with transaction.atomic():
+            users = self.step('пользователи', self.users, options['users'])
+            groups = self.step('группы', self.groups, options['groups'])
+            self.weights = list(accumulate(
+                1 / rank ** AUTHOR_SKEW for rank in range(1, len(users) + 1)
+            ))
+            posts = self.step(
+                'посты', self.posts, options['posts'], users, groups
+            )
+            self.step(
+                'подписки', self.follows, options['follows'], users
+            )
+            self.step(
+                'комментарии', self.comments, options['comments'],
+                users, posts
+            )
+            self.step('счётчики', stats.reconcile)
+            self.step('ленты подписок', timeline.rebuild)
+            self.step('поисковый индекс', search.rebuild)
+
+    def step(self, title, func, *args):
+        start = perf_counter()
+        result = func(*args)
+        self.stdout.write(f'{title}: {perf_counter() - start:.1f} с')
+        return result
+
+    def insert(self, model, objects, **options):
+        objects = iter(objects)
+        batch = list(islice(objects, self.batch_size))
+        while batch:
+            model.objects.bulk_create(batch, **options)
+            batch = list(islice(objects, self.batch_size))
+
+    def new_ids(self, model, after):
+        return list(
+            model.objects.filter(id__gt=after).values_list('id', flat=True)
+        )
+
+    def last_id(self, model):
+        return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+    def moment(self):
+        return self.now - timedelta(seconds=self.random.random() * self.period)
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.sentences, k=sentences))
+
+    def author(self, users):
+        return self.random.choices(users, cum_weights=self.weights)[0]
+
+    def users(self, total):
+        last = self.last_id(User)
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(
+                username=f'{self.faker.user_name()}_{last + number}',
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                email=self.faker.email(),
+                password=password,
+            )
+            for number in range(1, total + 1)
+        ))
+        users = self.new_ids(User, last)
+        # Ранг популярности не должен совпадать с порядком регистрации.
+        self.random.shuffle(users)
+        return users
+
+    def groups(self, total):
+        last = self.last_id(Group)
+        self.insert(Group, (
+            Group(
+                title=self.faker.catch_phrase()[:200],
+                slug=f'group-{last + number}',
+                description=self.text(3),
+            )
+            for number in range(1, total + 1)
+        ))
+        return self.new_ids(Group, last)
+
+    def posts(self, total, users, groups):
+        last = self.last_id(Post)
+        fields = [
+            Post._meta.get_field('pub_date'), Post._meta.get_field('updated')
+        ]
+        with explicit_dates(*fields):
+            self.insert(Post, self.new_posts(total, users, groups))
+        return self.new_ids(Post, last)
+
+    def new_posts(self, total, users, groups):
+        for _ in range(total):
+            pub_date = self.moment()
+            group = None
+            if groups and self.random.random() < GROUP_SHARE:
+                group = self.random.choice(groups)
+            yield Post(
+                author_id=self.author(users),
+                group_id=group,
+                text=self.text(self.random.randint(1, 6)),
+                pub_date=pub_date,
+                updated=pub_date,
+            )
+
+    def follows(self, total, users):
+        # Повторы и подписки на себя отбрасываются, поэтому подписок
+        # получается немного меньше total.
+        per_user = total // max(len(users), 1)
+        self.insert(Follow, (
+            Follow(user_id=user, author_id=author)
+            for user in users
+            for author in set(self.random.choices(
+                users, cum_weights=self.weights,
+                k=self.random.randint(0, 2 * per_user)
+            ))
+            if author != user
+        ), ignore_conflicts=True)
+
+    def comments(self, total, users, posts):
+        if not posts:
+            return
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.insert(Comment, (
+                Comment(
+                    post_id=self.random.choice(posts),
+                    author_id=self.random.choice(users),
+                    text=self.text(self.random.randint(1, 2)),
+                    created=self.moment(),
+                )
+                for _ in range(total)
+            ))
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.constants import THUMBNAIL_WORKERS
+from posts.models import Post
+from posts.thumbnails import generate, ready_thumbnail
+
+
+class Command(BaseCommand):
+    help = 'Создаёт недостающие миниатюры и варианты картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=THUMBNAIL_WORKERS
+        )
+
+    def handle(self, *args, **options):
+        # Список заранее: открытый курсор SQLite мешал бы записи из потоков.
+        posts = list(Post.objects.exclude(image='').only(
+            'id', 'image', 'image_variants'
+        ))
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            created = sum(pool.map(self.process, posts))
+        self.stdout.write(f'Создано миниатюр: {created}')
+
+    def process(self, post):
+        try:
+            if (post.variants
+                    and ready_thumbnail(post.image) is not None):
+                return 0
+            generate(post)
+            return 1
+        except Exception as error:
+            self.stderr.write(f'Пост {post.id}: {error}')
+            return 0
+        finally:
+            connections.close_all()
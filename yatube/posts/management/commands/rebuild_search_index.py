@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.search import fts_enabled, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс полнотекстового поиска по постам.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild()
+        backend = 'FTS5' if fts_enabled() else 'SearchTerm'
+        self.stdout.write(f'Индекс поиска пересобран ({backend}).')
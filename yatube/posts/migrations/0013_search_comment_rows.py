@@ -0,0 +1,57 @@
+# Generated by Django 2.2.16 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_comment_rows(apps, schema_editor):
+    # Комментарии становятся отдельными записями индекса. SearchTerm
+    # в старом формате очищается, его заново заполняет
+    # manage.py rebuild_search_index.
+    apps.get_model('posts', 'SearchTerm').objects.all().delete()
+    connection = schema_editor.connection
+    if 'posts_search' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_search')
+        cursor.execute(
+            "INSERT INTO posts_search (rowid, text, group_title, comments) "
+            "SELECT p.id, p.text, COALESCE(g.title, ''), '' "
+            "FROM posts_post p LEFT JOIN posts_group g ON g.id = p.group_id"
+        )
+        cursor.execute(
+            "INSERT INTO posts_search (rowid, text, group_title, comments) "
+            "SELECT -(post_id << 32 | id), '', '', text FROM posts_comment"
+        )
+
+
+def join_comment_rows(apps, schema_editor):
+    apps.get_model('posts', 'SearchTerm').objects.all().delete()
+    connection = schema_editor.connection
+    if 'posts_search' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM posts_search')
+        cursor.execute(
+            "INSERT INTO posts_search (rowid, text, group_title, comments) "
+            "SELECT p.id, p.text, COALESCE(g.title, ''), "
+            "COALESCE((SELECT group_concat(c.text, ' ') "
+            "FROM posts_comment c WHERE c.post_id = p.id), '') "
+            "FROM posts_post p LEFT JOIN posts_group g ON g.id = p.group_id"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchterm',
+            name='comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Comment', verbose_name='Комментарий'),
+        ),
+        migrations.RunPython(split_comment_rows, join_comment_rows),
+    ]
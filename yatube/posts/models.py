@@ -1,7 +1,10 @@
+import json
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
 from .constants import MAX_CHAR_LENGTH
+from .validators import validate_post_image
 
 User = get_user_model()
 
@@ -15,6 +18,25 @@ class Group(models.Model):
         return f'Группа {self.title}'
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов под конкретные страницы без N+1 запросов."""
+
+    def for_listing(self):
+        """Карточки в лентах: автор и группа одним JOIN."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """Страница поста: ещё и счётчики автора."""
+        return self.select_related('author__stats', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+
+    def for_listing(self):
+        """Комментарии под постом вместе с авторами, по индексу поста."""
+        return self.select_related('author').order_by('-created', '-id')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True)
@@ -33,22 +55,58 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        blank=True,
+        validators=[validate_post_image]
     )
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='JSON: формат, ширина, высота и адрес каждого варианта'
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:MAX_CHAR_LENGTH]
 
+    @property
+    def variants(self):
+        """Готовые варианты картинки, пустой список - ещё не созданы."""
+        try:
+            return json.loads(self.image_variants or '[]')
+        except ValueError:
+            return []
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -72,6 +130,8 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    objects = CommentQuerySet.as_manager()
+
     def __str__(self):
         return self.text
 
@@ -79,6 +139,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -95,5 +161,107 @@ class Follow(models.Model):
         verbose_name='Автор постов'
     )
 
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+        ]
+
     def __str__(self):
         return f'Автор: {self.author}, Подписчик: {self.user}'
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    post_count = models.PositiveIntegerField('Постов', default=0)
+    follower_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика пользователя'
+        verbose_name_plural = 'Статистика пользователей'
+
+    def __str__(self):
+        return f'Статистика {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    pub_date = models.DateTimeField('Дата публикации поста')
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'Лента {self.user}: {self.post_id}'
+
+
+class SearchTerm(models.Model):
+    """Запись инвертированного индекса поиска (без FTS5).
+
+    weight - сумма весов полей поста, где встретилось слово. Слова
+    комментария - отдельные записи с заполненным comment.
+    """
+    term = models.CharField('Слово', max_length=100)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Пост'
+    )
+    comment = models.ForeignKey(
+        Comment,
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='search_terms',
+        verbose_name='Комментарий'
+    )
+    weight = models.FloatField('Вес')
+
+    class Meta:
+        verbose_name = 'Слово поиска'
+        verbose_name_plural = 'Слова поиска'
+        indexes = [
+            models.Index(fields=['term', 'post'], name='search_term_idx'),
+        ]
+
+    def __str__(self):
+        return self.term
@@ -0,0 +1,436 @@
+"""Полнотекстовый поиск по постам.
+
+Документ поиска - пост: его текст, название группы и тексты
+комментариев. Каждый комментарий индексируется отдельной записью,
+поэтому новый комментарий не переписывает индекс всего поста, а пост
+находится, если каждое слово запроса есть в нём или в комментариях.
+
+На SQLite с FTS5 записи лежат в виртуальной таблице posts_search
+(ранжирование bm25, сниппеты snippet()). Без FTS5 работает
+инвертированный индекс в SearchTerm: разбиение на слова и TF-IDF
+считаются в Python, в базе только списки постов по словам.
+
+Индекс обновляется сигналами Post, Comment и Group, после bulk_create
+и правок в обход ORM его пересобирает rebuild().
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from itertools import islice
+
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Sum, When
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .constants import SEARCH_SNIPPET_WORDS, SEARCH_WEIGHTS
+from .models import Comment, Group, Post, SearchTerm
+
+FTS_TABLE = 'posts_search'
+INDEX_BATCH_SIZE = 1000
+
+WORD_RE = re.compile(r'\w+')
+# Границы подсветки: управляющие символы не встречаются в тексте постов
+# и переживают escape(), <mark> ставится уже после экранирования.
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+@lru_cache(maxsize=None)
+def _has_fts_table(database):
+    return FTS_TABLE in connection.introspection.table_names()
+
+
+def fts_enabled():
+    """Есть ли виртуальная таблица FTS5 (её создаёт миграция)."""
+    return (
+        connection.vendor == 'sqlite'
+        and _has_fts_table(connection.settings_dict['NAME'])
+    )
+
+
+def words(text):
+    return WORD_RE.findall(text)
+
+
+def normalize(word):
+    """Слово как в unicode61: без регистра, у латиницы без диакритики."""
+    chars = []
+    for char in unicodedata.normalize('NFKD', word.casefold()):
+        if unicodedata.combining(char) and chars and chars[-1].isascii():
+            continue
+        chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars))
+
+
+def tokenize(text):
+    return [normalize(word) for word in words(text)]
+
+
+def highlight(text):
+    """Экранирует сниппет и превращает границы в <mark>."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def _post_ids_sql(posts):
+    sql, params = posts.order_by().values('id').query.sql_with_params()
+    return sql, list(params)
+
+
+class FTSIndex:
+    """Поиск по таблице FTS5.
+
+    rowid записи комментария - минус (id поста << 32 | id комментария):
+    id поста берётся из rowid без чтения записи, а записи комментариев
+    поста лежат подряд. id комментариев меньше 2 ** 32.
+    """
+
+    post_id_sql = '(CASE WHEN rowid > 0 THEN rowid ELSE -rowid >> 32 END)'
+
+    @staticmethod
+    def _comment_rowid(comment):
+        return -(comment.post_id << 32 | comment.id)
+
+    def _insert(self, cursor, posts):
+        sql, params = _post_ids_sql(posts)
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text, group_title, comments) '
+            f'SELECT p.id, p.text, COALESCE(g.title, \'\'), \'\' '
+            f'FROM {Post._meta.db_table} p '
+            f'LEFT JOIN {Group._meta.db_table} g ON g.id = p.group_id '
+            f'WHERE p.id IN ({sql})',
+            params
+        )
+
+    def index(self, posts):
+        sql, params = _post_ids_sql(posts)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({sql})', params
+            )
+            self._insert(cursor, posts)
+
+    def remove(self, post_id):
+        # Вместе с записями комментариев, даже удалённых в обход ORM.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s '
+                f'OR rowid BETWEEN %s AND %s',
+                [post_id, -((post_id + 1) << 32) + 1, -(post_id << 32)]
+            )
+
+    def index_comment(self, comment):
+        rowid = self._comment_rowid(comment)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, text, group_title, comments) '
+                f'VALUES (%s, \'\', \'\', %s)',
+                [rowid, comment.text]
+            )
+
+    def remove_comment(self, comment):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [self._comment_rowid(comment)]
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            self._insert(cursor, Post.objects.all())
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} '
+                f'(rowid, text, group_title, comments) '
+                f'SELECT -(post_id << 32 | id), \'\', \'\', text '
+                f'FROM {Comment._meta.db_table}'
+            )
+
+    def _hits(self, words, rank='', condition=''):
+        """Записи со словами запроса, по подзапросу на слово.
+
+        Слова ищутся по отдельности: они могут быть в разных записях
+        поста - в тексте и в комментариях.
+        """
+        # Каждое слово в кавычках: запрос не разбирается как синтаксис FTS.
+        sql = ' UNION ALL '.join(
+            f'SELECT {self.post_id_sql} AS post_id, {number} AS word{rank} '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s{condition}'
+            for number in range(len(words))
+        )
+        return sql, [f'"{word}"' for word in words]
+
+    def _matched(self, query_words):
+        """SQL id постов, где есть все слова запроса."""
+        words = list(dict.fromkeys(query_words))
+        hits, params = self._hits(words)
+        return (
+            f'SELECT post_id FROM ({hits}) GROUP BY post_id '
+            f'HAVING count(DISTINCT word) = %s',
+            params + [len(words)]
+        )
+
+    def post_ids(self, query_words):
+        """Подзапрос id найденных постов для фильтра id__in."""
+        return RawSQL(*self._matched(query_words))
+
+    def count(self, query_words):
+        sql, params = self._matched(query_words)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM ({sql})', params)
+            return cursor.fetchone()[0]
+
+    def _ranked(self, query_words):
+        """SQL постов со всеми словами запроса и суммой bm25 их записей.
+
+        bm25 считается только для записей найденных постов: сначала
+        посты отбираются по rowid, это дешевле.
+        """
+        words = list(dict.fromkeys(query_words))
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS.values())
+        rank = f', bm25({FTS_TABLE}, {weights}) AS rank'
+        if len(words) == 1:
+            prefix, params, condition = '', [], ''
+        else:
+            matched, params = self._matched(words)
+            prefix = f'WITH matched AS ({matched}) '
+            condition = f' AND {self.post_id_sql} IN matched'
+        hits, hit_params = self._hits(words, rank, condition)
+        # LIMIT -1 не даёт SQLite встроить подзапрос в группировку:
+        # там bm25() недоступна.
+        return (
+            f'{prefix}SELECT post_id, sum(rank) AS rank '
+            f'FROM ({hits} LIMIT -1) GROUP BY post_id',
+            params + hit_params
+        )
+
+    def search(self, query_words, offset, limit):
+        """Список (id поста, сниппет) в порядке релевантности.
+
+        Сниппет строится по тексту поста; если слова нашлись только
+        в комментариях, вместо него None.
+        """
+        sql, params = self._ranked(query_words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{sql} ORDER BY rank, post_id DESC LIMIT %s OFFSET %s',
+                params + [limit, offset]
+            )
+            post_ids = [post_id for post_id, _ in cursor.fetchall()]
+            if not post_ids:
+                return []
+            # Сниппеты только для постов страницы.
+            cursor.execute(
+                f'SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, %s, %s) '
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid IN ({", ".join(["%s"] * len(post_ids))})',
+                [MARK_START, MARK_END, '…', SEARCH_SNIPPET_WORDS,
+                 ' OR '.join(f'"{word}"' for word in query_words),
+                 *post_ids]
+            )
+            snippets = dict(cursor.fetchall())
+        return [(post_id, snippets.get(post_id)) for post_id in post_ids]
+
+
+class InvertedIndex:
+    """Инвертированный индекс в SearchTerm, ранжирование TF-IDF.
+
+    Слова поста и каждого комментария - отдельные записи: у записей
+    комментария заполнено поле comment.
+    """
+
+    @staticmethod
+    def _weights(fields):
+        weights = Counter()
+        for field, text in fields.items():
+            for term in tokenize(text):
+                weights[term[:100]] += SEARCH_WEIGHTS[field]
+        return weights.items()
+
+    def _post_terms(self, posts):
+        for post_id, text, group_title in posts.order_by().values_list(
+            'id', 'text', 'group__title'
+        ).iterator():
+            fields = {'text': text, 'group_title': group_title or ''}
+            for term, weight in self._weights(fields):
+                yield SearchTerm(term=term, post_id=post_id, weight=weight)
+
+    def _comment_terms(self, comments):
+        for comment_id, post_id, text in comments.order_by().values_list(
+            'id', 'post_id', 'text'
+        ).iterator():
+            for term, weight in self._weights({'comments': text}):
+                yield SearchTerm(
+                    term=term, post_id=post_id, comment_id=comment_id,
+                    weight=weight
+                )
+
+    @staticmethod
+    def _insert(terms):
+        batch = list(islice(terms, INDEX_BATCH_SIZE))
+        while batch:
+            SearchTerm.objects.bulk_create(batch)
+            batch = list(islice(terms, INDEX_BATCH_SIZE))
+
+    def index(self, posts):
+        SearchTerm.objects.filter(post__in=posts, comment=None).delete()
+        self._insert(self._post_terms(posts))
+
+    def remove(self, post_id):
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+    def index_comment(self, comment):
+        SearchTerm.objects.filter(comment_id=comment.id).delete()
+        self._insert(
+            self._comment_terms(Comment.objects.filter(id=comment.id))
+        )
+
+    def remove_comment(self, comment):
+        SearchTerm.objects.filter(comment_id=comment.id).delete()
+
+    def rebuild(self):
+        SearchTerm.objects.all().delete()
+        self._insert(self._post_terms(Post.objects.all()))
+        self._insert(self._comment_terms(Comment.objects.all()))
+
+    def _matches(self, terms):
+        """id постов со всеми словами запроса и их вес TF-IDF.
+
+        None, если какого-то слова нет в индексе.
+        """
+        terms = list(dict.fromkeys(terms))
+        total = Post.objects.count()
+        frequencies = dict(
+            SearchTerm.objects.filter(term__in=terms)
+            .values('term')
+            .annotate(posts=Count('post', distinct=True))
+            .values_list('term', 'posts')
+        )
+        if not terms or len(frequencies) < len(terms):
+            return None
+        return SearchTerm.objects.filter(term__in=terms).values(
+            'post_id'
+        ).annotate(
+            matched=Count('term', distinct=True),
+            score=Sum(Case(
+                *(
+                    When(term=term, then=F('weight') * math.log(
+                        1 + total / frequencies[term]
+                    ))
+                    for term in terms
+                ),
+                output_field=FloatField()
+            ))
+        ).filter(matched=len(terms))
+
+    def post_ids(self, query_words):
+        matches = self._matches(tokenize(' '.join(query_words)))
+        if matches is None:
+            return SearchTerm.objects.none().values('post_id')
+        return matches.values('post_id')
+
+    def count(self, query_words):
+        matches = self._matches(tokenize(' '.join(query_words)))
+        return 0 if matches is None else matches.count()
+
+    def search(self, query_words, offset, limit):
+        """Список (id поста, None): сниппет строится по тексту поста."""
+        matches = self._matches(tokenize(' '.join(query_words)))
+        if matches is None:
+            return []
+        post_ids = matches.order_by('-score', '-post_id').values_list(
+            'post_id', flat=True
+        )[offset:offset + limit]
+        return [(post_id, None) for post_id in post_ids]
+
+
+def make_snippet(text, query_words):
+    """Окно из нескольких слов вокруг первого совпадения."""
+    terms = set(tokenize(' '.join(query_words)))
+    matches = list(WORD_RE.finditer(text))
+    first = next(
+        (number for number, match in enumerate(matches)
+         if normalize(match.group()) in terms),
+        0
+    )
+    start = max(0, first - SEARCH_SNIPPET_WORDS // 2)
+    window = matches[start:start + SEARCH_SNIPPET_WORDS]
+    if not window:
+        return ''
+    parts = ['…'] if start else []
+    position = window[0].start() if start else 0
+    for match in window:
+        parts.append(text[position:match.start()])
+        if normalize(match.group()) in terms:
+            parts.append(MARK_START + match.group() + MARK_END)
+        else:
+            parts.append(match.group())
+        position = match.end()
+    parts.append(text[position:] if window[-1] is matches[-1] else '…')
+    return ''.join(parts)
+
+
+def get_index():
+    return FTSIndex() if fts_enabled() else InvertedIndex()
+
+
+def index_posts(posts):
+    """Переиндексирует посты из queryset."""
+    get_index().index(posts)
+
+
+def remove_post(post_id):
+    get_index().remove(post_id)
+
+
+def index_comment(comment):
+    get_index().index_comment(comment)
+
+
+def remove_comment(comment):
+    get_index().remove_comment(comment)
+
+
+def rebuild():
+    get_index().rebuild()
+
+
+class SearchResults:
+    """Ленивая выдача поиска для Paginator: считает и режет в базе."""
+
+    def __init__(self, query_words, index=None):
+        self.query_words = query_words
+        self.index = index or get_index()
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.index.count(self.query_words)
+        return self._count
+
+    def __getitem__(self, key):
+        rows = self.index.search(
+            self.query_words, key.start or 0, key.stop - (key.start or 0)
+        )
+        posts = Post.objects.for_listing().in_bulk(
+            [post_id for post_id, _ in rows]
+        )
+        results = []
+        for post_id, snippet in rows:
+            if post_id in posts:
+                post = posts[post_id]
+                if snippet is None:
+                    snippet = make_snippet(post.text, self.query_words)
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
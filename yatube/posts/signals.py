@@ -0,0 +1,173 @@
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import conditional, search, stats, timeline
+from .constants import POST_CARD_FRAGMENT
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out_job.delay(instance.id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        stats.change_user(instance.author_id, 'post_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    stats.change_user(instance.author_id, 'post_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        stats.change_user(instance.author_id, 'follower_count', 1)
+        stats.change_user(instance.user_id, 'following_count', 1)
+        timeline.follower_count_changed(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    stats.change_user(instance.author_id, 'follower_count', -1)
+    stats.change_user(instance.user_id, 'following_count', -1)
+    timeline.follower_count_changed(instance.author_id, -1)
+
+
+# После счётчиков: backfill сверяет порог pull с follower_count.
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill_job.delay(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        stats.change_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    stats.change_comments(instance.post_id, -1)
+
+
+@receiver(post_delete, sender=Post)
+def drop_post_cards(sender, instance, **kwargs):
+    # Варианты ключа совпадают с vary_on тега cache в post.html.
+    cache.delete_many([
+        make_template_fragment_key(
+            POST_CARD_FRAGMENT, [instance.id, instance.updated, hide_group]
+        )
+        for hide_group in ('', True)
+    ])
+
+
+@receiver(post_save, sender=Group)
+def refresh_group_cards(sender, instance, created, **kwargs):
+    if not created:
+        instance.posts.update(updated=timezone.now())
+        conditional.touch(conditional.ALL)
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, update_fields,
+                         **kwargs):
+    # Вход пользователя сохраняет только last_login - карточки не меняются.
+    if created or (
+        update_fields and not {'first_name', 'last_name'} & update_fields
+    ):
+        return
+    instance.posts.update(updated=timezone.now())
+    conditional.touch(conditional.ALL)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.index_posts(Post.objects.filter(id=instance.id))
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.id)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.remove_comment(instance)
+
+
+@receiver(post_save, sender=Group)
+def index_group_posts(sender, instance, created, **kwargs):
+    if not created:
+        search.index_posts(instance.posts.all())
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления у постов уже group=NULL: запоминаем их заранее.
+    instance.search_post_ids = list(
+        instance.posts.values_list('id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Group)
+def index_ungrouped_posts(sender, instance, **kwargs):
+    search.index_posts(Post.objects.filter(id__in=instance.search_post_ids))
+
+
+@receiver(pre_save, sender=Post)
+def touch_previous_group_feed(sender, instance, **kwargs):
+    # Пост перенесли в другую группу - старая лента тоже изменилась.
+    if instance.pk is None:
+        return
+    slug = Post.objects.filter(pk=instance.pk).exclude(
+        group_id=instance.group_id
+    ).values_list('group__slug', flat=True).first()
+    if slug:
+        conditional.touch(conditional.group_scope(slug))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def touch_post_feeds(sender, instance, **kwargs):
+    conditional.touch_post(instance)
+
+
+@receiver(post_delete, sender=Group)
+def touch_all_feeds(sender, instance, **kwargs):
+    conditional.touch(conditional.ALL)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def touch_profile_feeds(sender, instance, **kwargs):
+    # Счётчики подписок выводятся в шапке обоих профилей.
+    conditional.touch(
+        conditional.author_scope(instance.author.username),
+        conditional.author_scope(instance.user.username)
+    )
@@ -0,0 +1,87 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются сигналами атомарным UPDATE ... SET n = n + 1,
+расхождения (bulk_create, правки в обход ORM) исправляет reconcile().
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+RECONCILE_BATCH_SIZE = 1000
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def change_user(user_id, field, delta):
+    _change(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def change_comments(post_id, delta):
+    _change(Post.objects.filter(id=post_id), 'comment_count', delta)
+
+
+def _real_count(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total')[:1],
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _fix(queryset, fields):
+    """Записывает реальные значения в расходящиеся строки."""
+    total = 0
+    batch = []
+    for obj in queryset:
+        for field, real in fields.items():
+            setattr(obj, field, getattr(obj, real))
+        batch.append(obj)
+        if len(batch) == RECONCILE_BATCH_SIZE:
+            total += len(batch)
+            queryset.model.objects.bulk_update(batch, list(fields))
+            batch = []
+    if batch:
+        total += len(batch)
+        queryset.model.objects.bulk_update(batch, list(fields))
+    return total
+
+
+def reconcile():
+    """Пересчитывает все счётчики, возвращает число исправленных строк."""
+    missing = User.objects.filter(
+        stats__isnull=True
+    ).values_list('id', flat=True)
+    # Размер пачки выбирает бэкенд: у SQLite есть лимит на число строк
+    # в одном INSERT, явный batch_size его не учитывает.
+    UserStats.objects.bulk_create(
+        UserStats(user_id=user_id) for user_id in missing
+    )
+    users = UserStats.objects.annotate(
+        real_posts=_real_count(Post, 'author'),
+        real_followers=_real_count(Follow, 'author'),
+        real_following=_real_count(Follow, 'user'),
+    ).exclude(
+        post_count=F('real_posts'),
+        follower_count=F('real_followers'),
+        following_count=F('real_following'),
+    )
+    posts = Post.objects.annotate(
+        real_comments=_real_count(Comment, 'post')
+    ).exclude(comment_count=F('real_comments'))
+
+    return _fix(users, {
+        'post_count': 'real_posts',
+        'follower_count': 'real_followers',
+        'following_count': 'real_following',
+    }) + _fix(posts, {'comment_count': 'real_comments'})
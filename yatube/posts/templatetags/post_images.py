@@ -0,0 +1,69 @@
+from urllib.parse import quote
+
+from django import template
+
+from ..constants import POST_IMAGE_GEOMETRY, POST_IMAGE_SIZES
+
+register = template.Library()
+
+DEFAULT_WIDTH, DEFAULT_HEIGHT = map(int, POST_IMAGE_GEOMETRY.split('x'))
+# Заглушка размером с миниатюру, пока варианты не созданы: место под
+# картинку занято сразу, а оригинал не скачивается.
+PLACEHOLDER = 'data:image/svg+xml,' + quote(
+    f"<svg xmlns='http://www.w3.org/2000/svg' width='{DEFAULT_WIDTH}' "
+    f"height='{DEFAULT_HEIGHT}'><rect width='100%' height='100%' "
+    f"fill='#e9ecef'/></svg>"
+)
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'GIF': 'image/gif',
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'WEBP': 'image/webp',
+}
+
+
+def srcset(variants):
+    return ', '.join(
+        f'{variant["url"]} {variant["width"]}w' for variant in variants
+    )
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """<picture> с адаптивными вариантами или заглушкой."""
+    if not post.image:
+        return {}
+    variants = post.variants
+    if not variants:
+        # Варианты ещё не созданы (см. thumbnails.generate). Миниатюра
+        # sorl сохраняется вместе с ними, так что искать её в kvstore
+        # (запрос на пост) бесполезно.
+        return {
+            'src': PLACEHOLDER,
+            'width': DEFAULT_WIDTH,
+            'height': DEFAULT_HEIGHT,
+        }
+
+    # Первый формат - исходный, он же для <img> в старых браузерах.
+    formats = {}
+    for variant in variants:
+        formats.setdefault(variant['format'], []).append(variant)
+    fallback, *extra = formats
+    fallback_variants = formats[fallback]
+    src = min(
+        fallback_variants,
+        key=lambda variant: abs(variant['width'] - DEFAULT_WIDTH)
+    )
+    return {
+        'src': src['url'],
+        'width': src['width'],
+        'height': src['height'],
+        'srcset': srcset(fallback_variants),
+        'sizes': POST_IMAGE_SIZES,
+        'sources': [
+            {'type': MIME_TYPES[name], 'srcset': srcset(formats[name])}
+            for name in extra
+        ],
+    }
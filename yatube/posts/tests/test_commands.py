@@ -0,0 +1,63 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                      UserStats)
+
+
+class GenerateDataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'generate_data', users=20, groups=3, posts=100, follows=100,
+            comments=50, stdout=StringIO()
+        )
+
+    def test_generated_data(self):
+        """данные созданы, производные таблицы пересчитаны"""
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(UserStats.objects.count(), 20)
+        stats = UserStats.objects.order_by('-post_count').first()
+        self.assertEqual(
+            stats.post_count, Post.objects.filter(author=stats.user).count()
+        )
+        follow = Follow.objects.first()
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=follow.user_id).count(),
+            Post.objects.filter(
+                author__following__user=follow.user_id
+            ).count()
+        )
+
+    def test_bench_views_json(self):
+        """bench_views отдаёт метрики по каждой странице"""
+        out = StringIO()
+        call_command(
+            'bench_views', requests=3, warmup=0, profile_requests=2,
+            json='-', stdout=out
+        )
+        views = json.loads(out.getvalue())['views']
+        self.assertEqual(set(views), {
+            'index', 'group_list', 'profile', 'post_detail', 'follow_index'
+        })
+        self.assertEqual(views['index']['requests'], 3)
+        self.assertGreater(views['index']['queries'], 0)
+
+    def test_bench_templates_json(self):
+        """bench_templates сравнивает движки на каждом шаблоне"""
+        out = StringIO()
+        call_command(
+            'bench_templates', renders=2, warmup=1, json='-', stdout=out
+        )
+        templates = json.loads(out.getvalue())['templates']
+        self.assertIn('posts/index.html', templates)
+        self.assertTrue(
+            {'django', 'django-cached'} <= set(templates['posts/index.html'])
+        )
@@ -1,13 +1,20 @@
+import os
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock, skipUnless
 
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
+from posts import thumbnails
 from posts.forms import PostForm, CommentForm
 from posts.models import Group, Post, User, Comment
+from posts.validators import IMAGE_TOO_LARGE
+from PIL import Image, features
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -42,11 +49,21 @@ class PostCreateForm(TestCase):
         )
 
         cls.form = PostForm()
+        cls.small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
 
     def setUp(self):
+        # Сессии читаются через кеш: очистка до входа, иначе клиент
+        # класса найдёт в кеше сессию, откатанную в базе.
+        cache.clear()
         self.user = User.objects.create_user(username='Second_user')
         self.authorized_client.force_login(self.author)
-        cache.clear()
 
     @classmethod
     def tearDownClass(cls):
@@ -93,6 +110,192 @@ class PostCreateForm(TestCase):
         self.assertEqual(new_post.author, self.author)
         self.assertEqual(new_post.image, 'posts/small.gif')
 
+    def test_thumbnail_generated_outside_request(self):
+        """миниатюра создаётся не в запросе, шаблон её только ищет"""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        with mock.patch('posts.thumbnails.schedule') as schedule, \
+                mock.patch('sorl.thumbnail.base.ThumbnailBackend'
+                           '.get_thumbnail') as get_thumbnail:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'С картинкой', 'image': uploaded},
+                follow=True
+            )
+        post = Post.objects.get(text='С картинкой')
+        schedule.assert_called_once_with(post)
+        get_thumbnail.assert_not_called()
+        self.assertIsNone(thumbnails.ready_thumbnail(post.image))
+
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, post.image.url)
+        self.assertContains(response, 'src="data:image/svg+xml,')
+        self.assertContains(response, 'width="960" height="339"')
+
+        thumbnails.generate(post)
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image))
+        post.refresh_from_db()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, post.variants[0]['url'])
+
+    def create_image_post(self, image_format, size):
+        content = BytesIO()
+        Image.new('RGB', size).save(content, image_format)
+        return Post.objects.create(
+            author=self.author,
+            text='Варианты',
+            image=SimpleUploadedFile(
+                f'variants.{image_format.lower()}', content.getvalue()
+            )
+        )
+
+    def test_responsive_variants(self):
+        """для srcset создаются варианты нескольких ширин"""
+        post = self.create_image_post('JPEG', (2000, 1000))
+        thumbnails.generate(post)
+        post.refresh_from_db()
+        jpeg = [
+            (variant['width'], variant['height'])
+            for variant in post.variants if variant['format'] == 'JPEG'
+        ]
+        self.assertEqual(jpeg, [(480, 169), (960, 339), (1440, 508)])
+
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, f'{post.variants[2]["url"]} 1440w')
+
+    def test_small_image_is_not_upscaled(self):
+        """маленькая картинка даёт один вариант без увеличения"""
+        post = self.create_image_post('PNG', (300, 200))
+        thumbnails.generate(post)
+        post.refresh_from_db()
+        self.assertEqual(
+            [variant['width'] for variant in post.variants
+             if variant['format'] == 'PNG'],
+            [300]
+        )
+
+    @skipUnless(features.check('webp'), 'Pillow собран без WebP')
+    def test_webp_source(self):
+        """при поддержке WebP в <picture> есть отдельный <source>"""
+        post = self.create_image_post('JPEG', (2000, 1000))
+        thumbnails.generate(post)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.id})
+        )
+        self.assertContains(response, '<source type="image/webp"')
+
+    def test_variants_reset_on_image_change(self):
+        """при замене картинки старые варианты сбрасываются"""
+        post = self.create_image_post('PNG', (300, 200))
+        thumbnails.generate(post)
+        with mock.patch('posts.thumbnails.schedule'):
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={
+                    'text': post.text,
+                    'image': SimpleUploadedFile('new.gif', self.small_gif),
+                }
+            )
+        post.refresh_from_db()
+        self.assertEqual(post.variants, [])
+
+    def upload(self, name, content):
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(name=name, content=content),
+            }
+        )
+
+    def test_oversized_image_rejected_before_decoding(self):
+        """большой файл отклоняется по размеру без открытия в Pillow"""
+        with mock.patch('posts.uploads.POST_IMAGE_MAX_SIZE', 10), \
+                mock.patch('PIL.Image.open') as image_open:
+            response = self.upload('big.gif', self.small_gif)
+        image_open.assert_not_called()
+        self.assertFormError(response, 'form', 'image', IMAGE_TOO_LARGE)
+        self.assertFalse(Post.objects.filter(text='Пост с картинкой').exists())
+
+    def test_oversized_image_alone(self):
+        """обрыв загрузки на единственном поле даёт ошибку формы"""
+        with mock.patch('posts.uploads.POST_IMAGE_MAX_SIZE', 10):
+            response = self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'image': SimpleUploadedFile('big.gif', self.small_gif)}
+            )
+        self.assertFormError(response, 'form', 'image', IMAGE_TOO_LARGE)
+
+    def test_image_not_verified(self):
+        """картинка в лимите читается по заголовку, без verify()"""
+        with mock.patch.object(Image.Image, 'verify') as verify:
+            self.upload('small.gif', self.small_gif)
+        verify.assert_not_called()
+        self.assertTrue(Post.objects.filter(text='Пост с картинкой').exists())
+
+    def test_csrf_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.author)
+        response = client.post(
+            reverse('posts:post_create'), {'text': 'Без токена'}
+        )
+        self.assertTemplateUsed(response, 'core/403csrf.html')
+        self.assertFalse(Post.objects.filter(text='Без токена').exists())
+
+    def stored_images(self):
+        directory = os.path.join(TEMP_MEDIA_ROOT, 'posts')
+        if not os.path.isdir(directory):
+            return set()
+        return set(os.listdir(directory))
+
+    def test_retry_saves_image_once(self):
+        """повтор записи при блокировке не сохраняет картинку заново"""
+        def retry_twice(func):
+            def wrapper():
+                func()
+                return func()
+            return wrapper
+
+        before = self.stored_images()
+        with mock.patch('posts.uploads.retry_on_lock', retry_twice):
+            self.upload('retry.gif', self.small_gif)
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(
+            self.stored_images() - before,
+            {os.path.basename(post.image.name)}
+        )
+
+    def test_failed_save_removes_image(self):
+        """если запись не удалась, файл картинки не остаётся"""
+        def locked(func):
+            def wrapper():
+                raise OperationalError('database is locked')
+            return wrapper
+
+        before = self.stored_images()
+        with mock.patch('posts.uploads.retry_on_lock', locked), \
+                self.assertRaises(OperationalError):
+            self.upload('locked.gif', self.small_gif)
+        self.assertEqual(self.stored_images(), before)
+
+    def test_image_header_limits(self):
+        """формат и размеры проверяются по заголовку картинки"""
+        for image_format, size in (('BMP', (2, 2)), ('PNG', (20000, 1))):
+            with self.subTest(image_format=image_format):
+                content = BytesIO()
+                Image.new('1', size).save(content, image_format)
+                response = self.upload(
+                    f'image.{image_format.lower()}', content.getvalue()
+                )
+                self.assertEqual(len(response.context['form'].errors), 1)
+        self.assertFalse(Post.objects.filter(text='Пост с картинкой').exists())
+
     def test_form_edit_post(self):
         """проверка редактирования поста"""
 
@@ -1,7 +1,11 @@
+from unittest import skipUnless
+
+from django.db import IntegrityError, connection
 from django.test import TestCase
 
-from ..models import Group, User, Post
-from ..constants import MAX_CHAR_LENGTH
+from ..models import Comment, Follow, Group, User, Post, UserStats
+from ..constants import MAX_CHAR_LENGTH, PAGINATOR_COUNT
+from ..stats import reconcile
 
 
 class PostModelTest(TestCase):
@@ -27,3 +31,84 @@ class PostModelTest(TestCase):
     def test_model_group_have_correct_object_names(self):
         """Проверяем, что у моделей корректно работает __str__."""
         self.assertEqual(f"Группа {self.group.title}", str(self.group))
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, подписками и комментариями."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        self.assertEqual(self.stats(self.author).post_count, 1)
+        self.assertEqual(self.stats(self.author).follower_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+
+        follow.delete()
+        post.delete()
+        self.assertEqual(self.stats(self.author).post_count, 0)
+        self.assertEqual(self.stats(self.author).follower_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_reconcile_fixes_drift(self):
+        """reconcile пересчитывает счётчики после bulk_create."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Пост') for _ in range(3)
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        self.assertEqual(reconcile(), 1)
+        self.assertEqual(self.stats(self.author).post_count, 3)
+        self.assertEqual(self.stats(self.reader).post_count, 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы лент и подписок идут по составным индексам без сортировки."""
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def assertUsesIndex(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feed_indexes(self):
+        posts = Post.objects.order_by('-pub_date', '-id')
+        self.assertUsesIndex(
+            posts.filter(author_id=1)[:PAGINATOR_COUNT],
+            'post_author_pub_date_idx'
+        )
+        self.assertUsesIndex(
+            posts.filter(group_id=1)[:PAGINATOR_COUNT],
+            'post_group_pub_date_idx'
+        )
+        self.assertUsesIndex(
+            Comment.objects.filter(post_id=1).order_by('-created', '-id'),
+            'comment_post_created_idx'
+        )
+
+    def test_follow_lookup_uses_unique_index(self):
+        plan = self.plan(Follow.objects.filter(user_id=1, author_id=2))
+        self.assertIn('INDEX', plan)
+        self.assertIn('user_id=? AND author_id=?', plan)
+
+    def test_follow_is_unique(self):
+        user = User.objects.create_user(username='user')
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=user, author=author)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=user, author=author)
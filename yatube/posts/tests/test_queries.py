@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..constants import PAGINATOR_COUNT
+from ..models import Comment, Follow, Group, Post, User
+
+# Без кеша карточек: иначе N+1 прятался бы за фрагментным кешем.
+DUMMY_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+# Сессии в базе: по запросу на сессию и пользователя у вошедшего.
+@override_settings(
+    CACHES=DUMMY_CACHES,
+    SESSION_ENGINE='django.contrib.sessions.backends.db',
+    AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'],
+)
+class QueryCountTest(TestCase):
+    """Число запросов страницы не зависит от числа объектов на ней."""
+    PAGE_SIZES = (2, PAGINATOR_COUNT)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {number}'
+            )
+            for number in range(PAGINATOR_COUNT + 1)
+        ]
+        cls.lonely_post, cls.busy_post = posts[:2]
+        Comment.objects.create(
+            post=cls.lonely_post, author=cls.reader, text='Комментарий'
+        )
+        for number in range(PAGINATOR_COUNT):
+            Comment.objects.create(
+                post=cls.busy_post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def count_queries(self, client, url, page_size=PAGINATOR_COUNT):
+        with mock.patch('posts.utils.PAGINATOR_COUNT', page_size), \
+                mock.patch('posts.views.PAGINATOR_COUNT', page_size), \
+                CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assert_page_queries(self, client, url, expected):
+        for page_size in self.PAGE_SIZES:
+            with self.subTest(url=url, page_size=page_size):
+                self.assertEqual(
+                    self.count_queries(client, url, page_size), expected
+                )
+
+    def test_listing_pages(self):
+        """ленты: запрос страницы и по запросу на шапку"""
+        pages = (
+            (self.guest_client, reverse('posts:index'), 1),
+            (self.guest_client, reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ), 2),
+            (self.guest_client, reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ), 2),
+            # Сессия и пользователь, проверка подписки.
+            (self.reader_client, reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ), 5),
+            (self.reader_client, reverse('posts:follow_index'), 4),
+        )
+        for client, url, expected in pages:
+            self.assert_page_queries(client, url, expected)
+
+    def test_post_detail_comments(self):
+        """комментарии с авторами загружаются одним запросом"""
+        for post in (self.lonely_post, self.busy_post):
+            with self.subTest(comments=post.comments.count()):
+                self.assertEqual(
+                    self.count_queries(
+                        self.guest_client,
+                        reverse(
+                            'posts:post_detail', kwargs={'post_id': post.id}
+                        )
+                    ),
+                    2
+                )
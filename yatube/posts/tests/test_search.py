@@ -0,0 +1,178 @@
+from unittest import SkipTest, mock
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Group, Post, User
+
+
+class SearchTest(TestCase):
+    """Поиск по индексу FTS5 (если он есть у SQLite)."""
+    fts = True
+
+    @classmethod
+    def setUpClass(cls):
+        if cls.fts and not search.fts_enabled():
+            raise SkipTest('SQLite собран без FTS5')
+        cls.patcher = mock.patch(
+            'posts.search.fts_enabled', return_value=cls.fts
+        )
+        cls.patcher.start()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.patcher.stop()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Садоводство', slug='garden', description='Описание'
+        )
+        cls.garden_post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первые <b>томаты</b>'
+        )
+        cls.tomato_post = Post.objects.create(
+            author=cls.author, text='Томаты, томаты и ещё раз томаты'
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.author, text='Совсем о другом'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query):
+        response = self.client.get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_text_and_group_title(self):
+        """ищется текст поста и название группы, регистр не важен"""
+        self.assertEqual(
+            {post.id for post in self.found('ТОМАТЫ')},
+            {self.garden_post.id, self.tomato_post.id}
+        )
+        self.assertEqual(self.found('садоводство'), [self.garden_post])
+        self.assertEqual(self.found('томаты садоводство'), [self.garden_post])
+        self.assertEqual(self.found('огурцы'), [])
+
+    def test_ranking(self):
+        """чаще встречающееся слово поднимает пост выше"""
+        self.assertEqual(self.found('томаты')[0], self.tomato_post)
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        """разметка из текста экранируется, совпадение подсвечено"""
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'садоводство первые'}
+        )
+        self.assertContains(response, '<mark>Первые</mark>')
+        self.assertContains(response, '&lt;b&gt;томаты&lt;/b&gt;')
+
+    def test_index_follows_changes(self):
+        """индекс обновляется при правке, комментарии и удалении"""
+        post = Post.objects.get(id=self.other_post.id)
+        post.text = 'Теперь про томаты'
+        post.save()
+        self.assertIn(post, self.found('томаты'))
+
+        comment = Comment.objects.create(
+            post=post, author=self.author, text='Огурцы лучше'
+        )
+        self.assertEqual(self.found('огурцы'), [post])
+        comment.text = 'Кабачки лучше'
+        comment.save()
+        self.assertEqual(self.found('огурцы'), [])
+        self.assertEqual(self.found('кабачки'), [post])
+        comment.delete()
+        self.assertEqual(self.found('кабачки'), [])
+        self.assertEqual(self.found('огурцы'), [])
+
+        group = Group.objects.get(id=self.group.id)
+        group.title = 'Огород'
+        group.save()
+        self.assertEqual(self.found('огород'), [self.garden_post])
+        group.delete()
+        self.assertEqual(self.found('огород'), [])
+
+        Post.objects.get(id=self.tomato_post.id).delete()
+        self.assertNotIn(self.tomato_post, self.found('томаты'))
+
+    def test_words_from_post_and_comments(self):
+        """слова запроса ищутся и в тексте поста, и в комментариях"""
+        for text in ('Полив утром', 'Полив вечером'):
+            Comment.objects.create(
+                post=self.tomato_post, author=self.author, text=text
+            )
+        self.assertEqual(self.found('томаты утром'), [self.tomato_post])
+        self.assertEqual(self.found('утром вечером'), [self.tomato_post])
+        self.assertEqual(self.found('полив'), [self.tomato_post])
+        self.assertEqual(self.found('утром садоводство'), [])
+        Post.objects.get(id=self.tomato_post.id).delete()
+        self.assertEqual(self.found('полив'), [])
+
+    def test_comment_indexed_alone(self):
+        """новый комментарий не переиндексирует пост и другие комментарии"""
+        Comment.objects.create(
+            post=self.tomato_post, author=self.author, text='Первый'
+        )
+        with mock.patch.object(
+            search.Comment.objects, 'filter',
+            wraps=search.Comment.objects.filter
+        ) as comments, mock.patch.object(
+            search, 'index_posts'
+        ) as index_posts:
+            comment = Comment.objects.create(
+                post=self.tomato_post, author=self.author, text='Второй'
+            )
+        index_posts.assert_not_called()
+        for call in comments.call_args_list:
+            self.assertEqual(call[1], {'id': comment.id})
+        self.assertEqual(self.found('первый второй'), [self.tomato_post])
+
+    def test_rebuild(self):
+        """rebuild подхватывает посты, созданные в обход сигналов"""
+        post, = Post.objects.bulk_create([
+            Post(author=self.author, text='Кабачки из bulk_create')
+        ])
+        Comment.objects.bulk_create([
+            Comment(post=self.other_post, author=self.author, text='Тыквы')
+        ])
+        self.assertEqual(self.found('кабачки'), [])
+        search.rebuild()
+        self.assertEqual(len(self.found('кабачки')), 1)
+        self.assertEqual(self.found('тыквы'), [self.other_post])
+
+    def test_admin_uses_index(self):
+        """поиск в админке идёт через индекс"""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'садоводство'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.garden_post]
+        )
+
+
+class InvertedSearchTest(SearchTest):
+    """Тот же поиск через инвертированный индекс SearchTerm."""
+    fts = False
+
+
+class FTSEnabledTest(TestCase):
+
+    def test_checks_table(self):
+        """без таблицы FTS5 поиск идёт по SearchTerm"""
+        search._has_fts_table.cache_clear()
+        self.addCleanup(search._has_fts_table.cache_clear)
+        with mock.patch.object(
+            connection.introspection, 'table_names', return_value=[]
+        ):
+            self.assertFalse(search.fts_enabled())
+            self.assertIsInstance(search.get_index(), search.InvertedIndex)
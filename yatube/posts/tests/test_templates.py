@@ -0,0 +1,114 @@
+import re
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..constants import POST_CARD_FRAGMENT
+from ..models import Comment, Follow, Group, Post, User
+
+try:
+    import jinja2
+except ImportError:
+    jinja2 = None
+
+
+def text(html):
+    """Видимый текст страницы без разметки и лишних пробелов."""
+    html = re.sub(r'<script>.*?</script>', ' ', html, flags=re.S)
+    return ' '.join(re.sub(r'<[^>]+>', ' ', html).split())
+
+
+def links(html):
+    return re.findall(r'href="([^"]*)"', html)
+
+
+@skipUnless(jinja2, 'Jinja2 не установлен')
+class Jinja2TemplatesTest(TestCase):
+    """Шаблоны Jinja2 выводят то же, что шаблоны Django."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group,
+            text='Все счастливые семьи\nпохожи друг на друга <b>'
+        )
+        Post.objects.create(author=cls.reader, text='Без группы')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def render(self, url, templates):
+        cache.clear()
+        # Без минификации: по отступам видно, какой движок рендерил.
+        with override_settings(TEMPLATES=templates, HTML_MINIFY=False):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_pages_match(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.reader.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:post_comments', args=[self.post.id]),
+            reverse('posts:follow_index'),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', args=[self.post.id]),
+            reverse('posts:search') + '?q=семьи',
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                django = self.render(url, [settings.DJANGO_TEMPLATES])
+                jinja = self.render(url, [
+                    settings.JINJA2_TEMPLATES, settings.DJANGO_TEMPLATES
+                ])
+                self.assertNotEqual(django, jinja)
+                self.assertEqual(text(jinja), text(django))
+                self.assertEqual(links(jinja), links(django))
+
+    def test_form_fields(self):
+        """фильтр addclass и csrf в форме Jinja2"""
+        html = self.render(reverse('posts:post_create'), [
+            settings.JINJA2_TEMPLATES, settings.DJANGO_TEMPLATES
+        ])
+        self.assertIn('class="form-control"', html)
+        self.assertIn('name="csrfmiddlewaretoken"', html)
+
+    def test_post_cards_share_cache(self):
+        """карточки кешируются под ключами тега cache Django"""
+        self.render(reverse('posts:group_list', args=[self.group.slug]), [
+            settings.JINJA2_TEMPLATES, settings.DJANGO_TEMPLATES
+        ])
+        key = make_template_fragment_key(
+            POST_CARD_FRAGMENT, [self.post.id, self.post.updated, True]
+        )
+        self.assertIsNotNone(cache.get(key))
+        self.post.delete()
+        self.assertIsNone(cache.get(key))
+
+    def test_test_client_context(self):
+        """тестовый клиент видит шаблон и контекст страницы Jinja2"""
+        url = reverse('posts:group_list', args=[self.group.slug])
+        with override_settings(TEMPLATES=[
+            settings.JINJA2_TEMPLATES, settings.DJANGO_TEMPLATES
+        ]):
+            response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/group_list.html')
+        self.assertEqual(response.context['group'], self.group)
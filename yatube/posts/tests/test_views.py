@@ -1,13 +1,27 @@
+import base64
+import shutil
+import tempfile
+import time
+from unittest import mock
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.cache.utils import make_template_fragment_key
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Post, Group, User, Follow, Comment
+from .. import conditional, timeline
+from ..models import Post, Group, User, Follow, Comment, TimelineEntry
 from ..forms import CommentForm
-from ..constants import PAGINATOR_COUNT
+from ..constants import (CURSOR_PARAM, FEED_CHANGED_CACHE_KEY,
+                         FEED_CHANGED_TIMEOUT, PAGINATOR_COUNT,
+                         POST_CARD_FRAGMENT)
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class TaskPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -107,6 +121,11 @@ class TaskPagesTests(TestCase):
                 {'is_edit': True})
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -199,30 +218,38 @@ class TaskPagesTests(TestCase):
             msg='Новый коммент отображается на странце другого поста.')
 
     def test_cache(self):
-        """тест корректной работы кеша """
-        old_response = self.author_user.get(
-            reverse('posts:index')
-        )
+        """тест кеширования карточек постов"""
+        self.author_user.get(reverse('posts:index'))
 
         new_post = Post.objects.create(
             author=self.user,
             text='post_text',
         )
-        response = self.authorized_client.get(reverse("posts:index"))
-        self.assertNotContains(response, new_post.text)
-
-        old_post_lists = [i for i in old_response.context['page_obj']]
-
-        cache.clear()
-
-        new_response = self.author_user.get(
-            reverse('posts:index')
-        )
-        new_post_lists = [i for i in new_response.context['page_obj']]
-        post_difference = set(new_post_lists).difference(set(old_post_lists))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, new_post.text)
 
-        self.assertEqual(len(post_difference), 1)
-        self.assertIn(new_post, post_difference)
+        Post.objects.filter(id=self.post.id).update(text='Без сигналов')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Без сигналов')
+
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Отредактирован'
+        post.save()
+        for address in self.page_urls:
+            with self.subTest(address=address):
+                response = self.authorized_client.get(address)
+                self.assertContains(response, post.text)
+
+    def test_post_card_dropped_on_delete(self):
+        """удаление поста убирает его карточку из кеша"""
+        post = Post.objects.create(author=self.user, text='Удалить')
+        self.client.get(reverse('posts:index'))
+        key = make_template_fragment_key(
+            POST_CARD_FRAGMENT, [post.id, post.updated, '']
+        )
+        self.assertIsNotNone(cache.get(key))
+        post.delete()
+        self.assertIsNone(cache.get(key))
 
     def post_check(self, context_post):
         """фунция проверки полей поста"""
@@ -274,31 +301,78 @@ class PaginatorViewsTest(TestCase):
             Post(group=cls.group, author=cls.user, text='Тестовый текст')
             for _ in range(PAGINATOR_COUNT)
         )
-        cls.paginator_obj = {
-            reverse('posts:index'): ('page_obj', PAGINATOR_COUNT),
-            reverse('posts:index') + '?page=2': ('page_obj', 1),
-            reverse('posts:group_list', kwargs={'slug': cls.group.slug}):
-                ('page_obj', PAGINATOR_COUNT),
-            reverse('posts:group_list', kwargs={'slug': cls.group.slug})
-            + '?page=2': ('page_obj', 1),
-            reverse(
-                'posts:profile', kwargs={'username': cls.user}):
-                ('page_obj', PAGINATOR_COUNT),
-            reverse('posts:profile', kwargs={'username': cls.user})
-            + '?page=2': ('page_obj', 1),
-        }
+        cls.paginated_urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+        )
 
     def setUp(self):
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
+        cache.clear()
 
     def test_paginator_count_posts_on_page(self):
         """проверка кол-ва постов на странице"""
-        for reverse_name, (post_list, num_posts) in self.paginator_obj.items():
-            with self.subTest(post_list=post_list):
-                response = self.client.get(reverse_name)
-                self.assertEqual(len(response.context[post_list]),
-                                 num_posts)
+        for address in self.paginated_urls:
+            with self.subTest(address=address):
+                response = self.client.get(address)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), PAGINATOR_COUNT)
+                self.assertTrue(page_obj.has_next())
+                self.assertFalse(page_obj.has_previous())
+
+                response = self.client.get(
+                    address,
+                    {CURSOR_PARAM: page_obj.paginator.next_cursor}
+                )
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), 1)
+                self.assertFalse(page_obj.has_next())
+                self.assertTrue(page_obj.has_previous())
+
+    def test_paginator_previous_and_last_pages(self):
+        """переход назад и на последнюю страницу по курсору"""
+        address = reverse('posts:index')
+        first_page = self.client.get(address).context['page_obj']
+        last_page = self.client.get(
+            address, {CURSOR_PARAM: first_page.paginator.last_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(last_page), PAGINATOR_COUNT)
+        self.assertEqual(last_page[-1], Post.objects.order_by('id')[0])
+        self.assertFalse(last_page.has_next())
+
+        previous_page = self.client.get(
+            address, {CURSOR_PARAM: last_page.paginator.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(previous_page), 1)
+        self.assertFalse(previous_page.has_previous())
+
+    def test_paginator_invalid_cursor(self):
+        """некорректный курсор открывает первую страницу"""
+        response = self.client.get(
+            reverse('posts:index'), {CURSOR_PARAM: 'not-a-cursor'}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAGINATOR_COUNT)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_paginator_out_of_range_cursor(self):
+        """курсор со значениями вне диапазона базы - первая страница"""
+        payloads = (
+            '[false, ["2020-01-01T00:00:00+00:00", 1e400]]',
+            f'[false, ["2020-01-01T00:00:00+00:00", {10 ** 23}]]',
+            '[false, ["0001-01-01T00:00:00+05:00", 1]]',
+        )
+        for payload in payloads:
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            with self.subTest(payload=payload):
+                response = self.client.get(
+                    reverse('posts:index'), {CURSOR_PARAM: cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), PAGINATOR_COUNT)
+                self.assertFalse(page_obj.has_previous())
 
     def test_groups_are_in_right_place(self):
         """проверка того что при создании
@@ -423,3 +497,297 @@ class FollowingTests(TestCase):
         response = self.authorised_user.get(reverse('posts:follow_index'))
         count_followed_post = len(response.context['page_obj'])
         self.assertEqual(count_followed_post, 2)
+
+    def test_timeline_follow_and_unfollow(self):
+        """Подписка заполняет ленту постами автора, отписка - чистит."""
+        self.authorised_user.get(
+            reverse('posts:profile_follow', kwargs={
+                'username': self.users[2].username
+            })
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.users[0], post__author=self.users[2]
+            ).count(),
+            self.users[2].posts.count()
+        )
+
+        self.authorised_user.get(
+            reverse('posts:profile_unfollow', kwargs={
+                'username': self.users[2].username
+            })
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=self.users[0], post__author=self.users[2]
+            ).exists()
+        )
+
+    def test_timeline_fan_out_on_create(self):
+        """Новый пост сразу попадает в ленты подписчиков."""
+        post = Post.objects.create(author=self.users[1], text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.users[0], post=post
+            ).exists()
+        )
+
+    def test_timeline_pull_author(self):
+        """Посты авторов с большим числом подписчиков читаются напрямую."""
+        cache.clear()
+        with mock.patch('posts.timeline.TIMELINE_PULL_FOLLOWERS', 1):
+            post = Post.objects.create(author=self.users[1], text='Pull')
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists()
+            )
+            response = self.authorised_user.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj[0], post)
+        self.assertEqual(len(page_obj), 3)
+
+    def test_timeline_author_leaves_pull(self):
+        """После отписки ниже порога посты автора остаются в лентах."""
+        cache.clear()
+        with mock.patch('posts.timeline.TIMELINE_PULL_FOLLOWERS', 2):
+            Follow.objects.create(user=self.users[2], author=self.users[1])
+            post = Post.objects.create(author=self.users[1], text='Pull')
+            self.assertFalse(
+                TimelineEntry.objects.filter(post=post).exists()
+            )
+            Follow.objects.filter(user=self.users[2]).delete()
+            self.assertTrue(
+                TimelineEntry.objects.filter(
+                    user=self.users[0], post=post
+                ).exists()
+            )
+            response = self.authorised_user.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+
+    def test_timeline_push_author_in_batches(self):
+        """посты автора раскладываются частями не больше пачки"""
+        author = self.users[1]
+        followers = [
+            User.objects.create_user(username=f'push{number}')
+            for number in range(3)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author) for user in followers
+        )
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {number}') for number in range(5)
+        )
+        sizes = []
+        bulk_create = TimelineEntry.objects.bulk_create
+
+        def record(entries, **kwargs):
+            sizes.append(len(entries))
+            return bulk_create(entries, **kwargs)
+
+        with mock.patch('posts.timeline.TIMELINE_BATCH_SIZE', 2), \
+                mock.patch.object(TimelineEntry.objects, 'bulk_create',
+                                  side_effect=record):
+            timeline.push_author(author.id)
+        self.assertLessEqual(max(sizes), 2)
+        for user in followers:
+            with self.subTest(user=user.username):
+                self.assertEqual(
+                    TimelineEntry.objects.filter(
+                        user=user, post__author=author
+                    ).count(),
+                    author.posts.count()
+                )
+
+    def test_timeline_backfill_skips_pull_author(self):
+        with mock.patch('posts.timeline.TIMELINE_PULL_FOLLOWERS', 1):
+            Follow.objects.create(user=self.users[0], author=self.users[2])
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=self.users[0], post__author=self.users[2]
+            ).exists()
+        )
+
+    def test_timeline_page_queries(self):
+        """Страница ленты читается одним запросом вместе с авторами."""
+        timeline.pull_author_ids()
+        with self.assertNumQueries(1):
+            page_obj = timeline.TimelinePaginator(
+                self.users[0], PAGINATOR_COUNT
+            ).get_page()
+            [(post.author.username, post.group.slug) for post in page_obj]
+
+
+@mock.patch('posts.utils.COMMENTS_PER_PAGE', 2)
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}'
+            )
+            for number in range(5)
+        ]
+        cls.comments.reverse()
+
+    def test_detail_renders_first_page(self):
+        """на странице поста только первая страница комментариев"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(list(comments), self.comments[:2])
+        self.assertContains(response, 'data-fragment=')
+
+    def test_comment_authors_without_extra_queries(self):
+        """авторы комментариев не подгружаются по одному (N+1)"""
+        for number in range(3):
+            Comment.objects.create(
+                post=self.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text='Ответ'
+            )
+        with self.settings(QUERYLOG_STRICT=True), mock.patch(
+            'posts.utils.COMMENTS_PER_PAGE', 5
+        ):
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+            )
+        self.assertContains(response, 'reader2')
+
+    def test_fragment_loads_next_batch(self):
+        """фрагмент по курсору отдаёт следующие комментарии"""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        cursor = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        ).context['comments'].paginator.next_cursor
+        response = self.client.get(url, {CURSOR_PARAM: cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[2:4])
+
+        data = self.client.get(
+            url, {CURSOR_PARAM: cursor, 'format': 'json'}
+        ).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [comment.id for comment in self.comments[2:4]]
+        )
+        data = self.client.get(
+            url, {CURSOR_PARAM: data['next_cursor'], 'format': 'json'}
+        ).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [self.comments[4].id]
+        )
+        self.assertIsNone(data['next_cursor'])
+
+    def test_fragment_for_missing_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def revalidate(self, client, url):
+        """Запрос с валидаторами из предыдущего ответа."""
+        response = client.get(url)
+        return client.get(
+            url,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+
+    def test_not_modified_until_feed_changes(self):
+        """304 до изменения ленты, после него - полный ответ"""
+        urls = {
+            'posts:index': {},
+            'posts:group_list': {'slug': self.group.slug},
+            'posts:profile': {'username': self.author.username},
+        }
+        for name, kwargs in urls.items():
+            url = reverse(name, kwargs=kwargs)
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.client, url).status_code, 304
+                )
+                response = self.client.get(url)
+                Post.objects.create(
+                    author=self.author, group=self.group, text='Новый'
+                )
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_delete_and_move_between_groups(self):
+        """удаление и перенос поста меняют ленты групп"""
+        other = Group.objects.create(title='Другая', slug='other')
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        etag = self.client.get(url)['ETag']
+        post = Post.objects.get(id=self.post.id)
+        post.group = other
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        url = reverse('posts:group_list', kwargs={'slug': other.slug})
+        etag = self.client.get(url)['ETag']
+        post.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_headers(self):
+        """анонимный ответ публичный, ответ вошедшему - приватный"""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+        response = self.reader_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotEqual(response['ETag'], self.client.get(url)['ETag'])
+
+    def test_marker_expires(self):
+        """метка ленты истекает: кеш воркера не держит её вечно"""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        key = FEED_CHANGED_CACHE_KEY.format(scope=conditional.INDEX)
+        later = FEED_CHANGED_TIMEOUT + 1
+        # Часы всех бэкендов: в tiered метка и в файле, и в LRU воркера.
+        with mock.patch('time.time', return_value=time.time() + later), \
+                mock.patch('time.monotonic',
+                           return_value=time.monotonic() + later):
+            self.assertIsNone(cache.get(key))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_follow_changes_profile(self):
+        """подписка меняет профиль: в нём кнопка и счётчики"""
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        etag = self.reader_client.get(url)['ETag']
+        self.reader_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['following'])
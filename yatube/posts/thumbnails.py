@@ -0,0 +1,171 @@
+"""Фоновая подготовка миниатюр картинок постов.
+
+Миниатюры создаются после сохранения поста задачей очереди (jobs),
+а без очереди (JOBS_EAGER) - пулом потоков. Pillow в запросе
+не вызывается: шаблоны берут готовые варианты из Post.image_variants,
+а пока их нет, показывают заглушку - не исходную картинку.
+
+Вместе с миниатюрой создаются варианты для srcset: несколько ширин
+в исходном формате и, если Pillow и sorl их поддерживают, в AVIF/WebP.
+Их адреса и размеры хранятся в Post.image_variants.
+"""
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings as django_settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+from jobs.queue import job
+
+from . import conditional
+from .constants import (POST_IMAGE_EXTRA_FORMATS, POST_IMAGE_GEOMETRY,
+                        POST_IMAGE_OPTIONS, POST_IMAGE_WIDTHS,
+                        THUMBNAIL_WORKERS)
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    """Бэкенд sorl, который только ищет уже созданные миниатюры."""
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        # Те же умолчания, что в ThumbnailBackend.get_thumbnail,
+        # иначе имя миниатюры не совпадёт.
+        if settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+lookup_backend = LookupBackend()
+
+
+def ready_thumbnail(image):
+    """Готовая миниатюра картинки поста или None."""
+    if not image:
+        return None
+    return lookup_backend.get_ready_thumbnail(
+        image, POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS
+    )
+
+
+def variant_formats(image):
+    """Формат исходной картинки и доступные дополнительные форматы."""
+    Image.init()
+    formats = [lookup_backend._get_format(ImageFile(image))]
+    for image_format in POST_IMAGE_EXTRA_FORMATS:
+        # Формат нужен и кодеку Pillow, и sorl для расширения файла.
+        if (image_format in Image.SAVE and image_format in EXTENSIONS
+                and image_format not in formats):
+            formats.append(image_format)
+    return formats
+
+
+def build_variants(image):
+    """Создаёт варианты картинки по ширинам и форматам."""
+    base_width, base_height = map(int, POST_IMAGE_GEOMETRY.split('x'))
+    variants = []
+    for image_format in variant_formats(image):
+        widths = set()
+        for width in POST_IMAGE_WIDTHS:
+            # Без увеличения: маленькая картинка даст один вариант.
+            thumbnail = get_thumbnail(
+                image,
+                f'{width}x{width * base_height // base_width}',
+                crop='center',
+                upscale=False,
+                format=image_format
+            )
+            if thumbnail.width in widths:
+                continue
+            widths.add(thumbnail.width)
+            variants.append({
+                'format': image_format,
+                'width': thumbnail.width,
+                'height': thumbnail.height,
+                'url': thumbnail.url,
+            })
+    return variants
+
+
+def generate(post):
+    """Создаёт миниатюры поста и обновляет его метку версии."""
+    with metrics.timer('thumbnail'):
+        get_thumbnail(post.image, POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS)
+        variants = build_variants(post.image)
+    # update() без сигналов: карточка в кеше пересоберётся с миниатюрой.
+    Post.objects.filter(id=post.id).update(
+        updated=timezone.now(),
+        image_variants=json.dumps(variants)
+    )
+    conditional.touch_post(post)
+
+
+@job
+def generate_job(post_id):
+    post = Post.objects.filter(id=post_id).first()
+    if post is not None and post.image:
+        generate(post)
+
+
+def _generate_for(post_id):
+    try:
+        generate_job(post_id)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру поста %s', post_id)
+
+
+def _generate_task(post_id):
+    try:
+        _generate_for(post_id)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def schedule(post):
+    """Ставит создание миниатюр в очередь или в пул после фиксации."""
+    if not post.image:
+        return
+    if not django_settings.JOBS_EAGER:
+        generate_job.delay(post.id)
+        return
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        # Общую in-memory базу SQLite блокируют целыми таблицами без
+        # ожидания, параллельная запись из пула падала бы с ошибкой.
+        transaction.on_commit(lambda: _generate_for(post.id))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(_generate_task, post.id)
+    )
@@ -0,0 +1,271 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в TimelineEntry каждого подписчика,
+при подписке лента дополняется постами автора, при отписке - чистится.
+Чтение ленты - диапазон по индексу (user, -pub_date, -post).
+Посты авторов с очень большим числом подписчиков не раскладываются,
+а подмешиваются при чтении (pull). Запись сверяется с порогом по базе,
+чтение - по кешированному списку pull-авторов. Когда автор опускается
+ниже порога, его посты раскладываются по лентам подписчиков
+(push_author_job) частями в коротких транзакциях: иначе ранние
+посты пропали бы из лент.
+
+Раскладка и дополнение ленты - фоновые задачи (fan_out_job,
+backfill_job): запрос на публикацию или подписку их не ждёт.
+"""
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import connection
+
+from core.db import retry_on_lock
+from jobs.queue import job
+
+from .constants import (TIMELINE_BATCH_SIZE, TIMELINE_PULL_CACHE_KEY,
+                        TIMELINE_PULL_CACHE_TIMEOUT, TIMELINE_PULL_FOLLOWERS)
+from .models import Follow, Post, TimelineEntry, UserStats
+from .utils import CursorPaginator
+
+ENTRY_FIELDS = {'pub_date': 'pub_date', 'id': 'post_id'}
+
+
+def pull_author_ids():
+    """Авторы, чьи посты читаются напрямую, а не из ленты."""
+    authors = cache.get(TIMELINE_PULL_CACHE_KEY)
+    if authors is None:
+        authors = set(
+            UserStats.objects.filter(
+                follower_count__gte=TIMELINE_PULL_FOLLOWERS
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(
+            TIMELINE_PULL_CACHE_KEY, authors, TIMELINE_PULL_CACHE_TIMEOUT
+        )
+    return authors
+
+
+def _bulk_insert(entries):
+    entries = iter(entries)
+    batch = list(islice(entries, TIMELINE_BATCH_SIZE))
+    while batch:
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        batch = list(islice(entries, TIMELINE_BATCH_SIZE))
+
+
+def is_pull_author(author_id):
+    # По базе, а не по кешу pull_author_ids: запись не должна
+    # пропустить пост автора, только что опустившегося ниже порога.
+    return UserStats.objects.filter(
+        user_id=author_id, follower_count__gte=TIMELINE_PULL_FOLLOWERS
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def push_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков.
+
+    Частями не больше TIMELINE_BATCH_SIZE записей, каждая в своей
+    короткой транзакции (_push_chunk): раскладка по большому числу
+    подписчиков не держит блокировку записи SQLite целиком.
+    """
+    posts = Post.objects.filter(author_id=author_id).order_by('id')
+    last_post = 0
+    while True:
+        ids = posts.filter(id__gt=last_post).values_list('id', flat=True)
+        ids = list(ids[:TIMELINE_BATCH_SIZE])
+        if not ids:
+            return
+        last_user = 0
+        while last_user is not None:
+            last_user = _push_chunk(
+                author_id, last_post, ids[-1], last_user
+            )
+        last_post = ids[-1]
+
+
+@retry_on_lock
+def _push_chunk(author_id, after_post, last_post, after_user):
+    """Посты автора из (after_post, last_post] следующим подписчикам.
+
+    Подписчики и посты читаются в той же транзакции, что и вставка:
+    отписка или удаление поста не вклинятся между ними. Возвращает
+    id последнего подписчика части или None, если подписчики кончились.
+    """
+    posts = list(
+        Post.objects.filter(
+            author_id=author_id, id__gt=after_post, id__lte=last_post
+        ).values_list('id', 'pub_date')
+    )
+    limit = max(1, TIMELINE_BATCH_SIZE // max(1, len(posts)))
+    followers = list(
+        Follow.objects.filter(
+            author_id=author_id, user_id__gt=after_user
+        ).order_by('user_id').values_list('user_id', flat=True)[:limit]
+    )
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in followers
+        for post_id, pub_date in posts
+    ], ignore_conflicts=True)
+    if len(followers) < limit:
+        return None
+    return followers[-1]
+
+
+def follower_count_changed(author_id, delta):
+    """Следит за переходом автора через порог pull.
+
+    Вызывается после изменения счётчика подписчиков на delta.
+    """
+    crossed = TIMELINE_PULL_FOLLOWERS if delta > 0 else (
+        TIMELINE_PULL_FOLLOWERS - 1
+    )
+    if not UserStats.objects.filter(
+        user_id=author_id, follower_count=crossed
+    ).exists():
+        return
+    cache.delete(TIMELINE_PULL_CACHE_KEY)
+    if delta < 0:
+        push_author_job.delay(author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты бывшего подписчика."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@job
+@retry_on_lock
+def fan_out_job(post_id):
+    """fan_out из очереди: пост к этому времени могли удалить."""
+    post = Post.objects.filter(id=post_id).only(
+        'id', 'author_id', 'pub_date'
+    ).first()
+    if post is not None:
+        fan_out(post)
+
+
+@job
+@retry_on_lock
+def backfill_job(user_id, author_id):
+    """backfill из очереди, если подписка ещё есть.
+
+    Проверка и вставка в одной транзакции: отписка (prune) не может
+    вклиниться между ними и оставить в ленте посты автора.
+    """
+    if Follow.objects.select_for_update().filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        backfill(user_id, author_id)
+
+
+@job
+def push_author_job(author_id):
+    """push_author из очереди, если автор всё ещё ниже порога."""
+    if not is_pull_author(author_id):
+        push_author(author_id)
+
+
+def rebuild():
+    """Пересобирает все ленты по подпискам одним INSERT ... SELECT.
+
+    Для данных, залитых bulk_create в обход сигналов. Счётчики
+    подписчиков (UserStats) должны быть уже пересчитаны: по ним
+    выбираются pull-авторы.
+    """
+    cache.delete(TIMELINE_PULL_CACHE_KEY)
+    pull = pull_author_ids()
+    TimelineEntry.objects.all().delete()
+    sql = (
+        f'INSERT INTO {TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id'
+    )
+    if pull:
+        placeholders = ', '.join(['%s'] * len(pull))
+        sql += f' WHERE f.author_id NOT IN ({placeholders})'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(pull))
+
+
+class TimelinePaginator(CursorPaginator):
+    """Пагинатор ленты подписок поверх TimelineEntry.
+
+    Страница собирается слиянием записей ленты и постов pull-авторов
+    по общему ключу (pub_date, id), поэтому курсоры совместимы
+    с обычным CursorPaginator по постам.
+    """
+
+    def __init__(self, user, per_page):
+        super().__init__(Post.objects.for_listing(), per_page)
+        self.entries = TimelineEntry.objects.filter(
+            user=user
+        ).select_related('post__author', 'post__group')
+        pull = pull_author_ids()
+        self.pull_authors = list(
+            Follow.objects.filter(
+                user=user, author_id__in=pull
+            ).values_list('author_id', flat=True)
+        ) if pull else []
+
+    def fetch(self, ordering, values, limit):
+        entry_ordering = tuple(
+            ('-' if name.startswith('-') else '')
+            + ENTRY_FIELDS[name.lstrip('-')]
+            for name in ordering
+        )
+        posts = [
+            entry.post for entry in
+            self.filter_after(self.entries, entry_ordering, values)[:limit]
+        ]
+        if not self.pull_authors:
+            return posts
+
+        pulled = self.filter_after(
+            self.object_list.filter(author_id__in=self.pull_authors),
+            ordering,
+            values
+        )[:limit]
+        merged = heapq.merge(
+            posts,
+            pulled,
+            key=lambda post: (post.pub_date, post.id),
+            reverse=ordering[0].startswith('-')
+        )
+        seen = set()
+        rows = []
+        for post in merged:
+            if post.id not in seen:
+                seen.add(post.id)
+                rows.append(post)
+        return rows[:limit]
@@ -0,0 +1,72 @@
+"""Приём картинки поста: потоком на диск и с обрывом по размеру.
+
+Обработчик ставится только во view, принимающих PostForm
+(post_image_uploads); остальные формы и админка работают
+с обработчиками Django по умолчанию.
+"""
+from functools import wraps
+
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from core.db import retry_on_lock
+
+from .constants import POST_IMAGE_MAX_SIZE
+
+
+class PostImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку сразу во временный файл, не держа её в памяти.
+
+    На первом байте сверх POST_IMAGE_MAX_SIZE разбор тела прекращается
+    (StopUpload без сброса соединения: остаток тела дочитывается
+    впустую), а у запроса ставится upload_too_large.
+    """
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > POST_IMAGE_MAX_SIZE:
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=False)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def upload_too_large(request):
+    return getattr(request, 'upload_too_large', False)
+
+
+def post_image_uploads(view):
+    """Ставит PostImageUploadHandler до разбора тела запроса.
+
+    CsrfViewMiddleware читает request.POST раньше view, и заменить
+    обработчики после этого нельзя. Поэтому, как советует документация
+    Django, view освобождается от проверки в middleware и проверяет
+    CSRF сам, уже после замены обработчиков.
+    """
+    protected = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [PostImageUploadHandler(request)]
+        return protected(request, *args, **kwargs)
+
+    return wrapper
+
+
+def save_post(post):
+    """Сохраняет пост, повторяя при блокировке базы только запись.
+
+    Новая картинка пишется в хранилище до транзакции: повтор не
+    сохраняет файл ещё раз под другим именем, а если запись так и не
+    удалась, файл удаляется.
+    """
+    image = post.image
+    new_image = bool(image) and not image._committed
+    if new_image:
+        image.save(image.name, image.file, save=False)
+    try:
+        retry_on_lock(post.save)()
+    except Exception:
+        if new_image:
+            image.delete(save=False)
+        raise
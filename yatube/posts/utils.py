@@ -1,11 +1,157 @@
-from django.core.paginator import Paginator
-from .constants import PAGINATOR_COUNT
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+
+from .constants import COMMENTS_PER_PAGE, CURSOR_PARAM, PAGINATOR_COUNT
+from .models import Comment
+
+# Целые в базе - знаковые 64-битные (INTEGER в SQLite, bigint).
+MAX_INTEGER = 2 ** 63 - 1
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) вместо OFFSET.
+
+    Страница выбирается фильтром по значениям полей сортировки
+    крайнего объекта соседней страницы, поэтому глубина страницы
+    не влияет на время запроса, а COUNT(*) не выполняется.
+    Последнее поле сортировки должно быть уникальным (обычно id).
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [
+            self.object_list.model._meta.get_field(name.lstrip('-'))
+            for name in self.ordering
+        ]
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.last_cursor = self.encode_cursor(True, None)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        # Номер страницы условный: 1 - первая, 2 - любая другая.
+        return self._num_pages
+
+    def encode_cursor(self, backwards, obj):
+        values = None
+        if obj is not None:
+            values = [field.value_to_string(obj) for field in self.fields]
+        raw = json.dumps([backwards, values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        backwards, values = json.loads(raw.decode())
+        if values is not None:
+            if len(values) != len(self.fields):
+                raise ValueError('Курсор не соответствует сортировке.')
+            values = [
+                field.to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+            if None in values:
+                raise ValueError('Пустое значение в курсоре.')
+            self.check_values(values)
+        return bool(backwards), values
+
+    def check_values(self, values):
+        """Проверяет, что значения курсора можно передать в базу.
+
+        Иначе неверный курсор (огромный id, дата за границей года 1
+        после перевода в UTC) упал бы OverflowError уже в запросе.
+        """
+        connection = connections[self.object_list.db]
+        for field, value in zip(self.fields, values):
+            value = field.get_db_prep_value(value, connection)
+            if isinstance(value, int) and abs(value) > MAX_INTEGER:
+                raise OverflowError('Целое в курсоре вне диапазона.')
+
+    def _after(self, ordering, values):
+        """Условие "строго после values" для заданной сортировки."""
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        # Нестрогая граница по первому полю даёт СУБД диапазон по индексу:
+        # без неё OR из условий выше приводит к полному сканированию.
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+
+    def filter_after(self, queryset, ordering, values):
+        """Сортирует queryset и отсекает объекты до курсора."""
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+        return queryset
+
+    def fetch(self, ordering, values, limit):
+        """Первые limit объектов после values в порядке ordering."""
+        return list(
+            self.filter_after(self.object_list, ordering, values)[:limit]
+        )
+
+    def get_page(self, cursor=None):
+        """Возвращает страницу по курсору, при ошибке - первую."""
+        backwards, values = False, None
+        if cursor:
+            try:
+                backwards, values = self.decode_cursor(cursor)
+            except (TypeError, ValueError, OverflowError, ValidationError):
+                pass
+
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(
+                name[1:] if name.startswith('-') else f'-{name}'
+                for name in ordering
+            )
+        rows = self.fetch(ordering, values, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = values is not None, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        has_next = has_next and bool(rows)
+        has_previous = has_previous and bool(rows)
+
+        self.next_cursor = (
+            self.encode_cursor(False, rows[-1]) if has_next else None
+        )
+        self.previous_cursor = (
+            self.encode_cursor(True, rows[0]) if has_previous else None
+        )
+        number = 2 if has_previous else 1
+        self._num_pages = number + has_next
+
+        return Page(rows, number, self)
 
 
 def pagination(queryset, request):
     """функция пагинатора"""
-    paginator = Paginator(queryset, PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    paginator = CursorPaginator(queryset, PAGINATOR_COUNT)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
 
     return {'page_obj': page_obj}
+
+
+def comment_pagination(post_id, request):
+    """Страница комментариев поста, новые сверху."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).for_listing(),
+        COMMENTS_PER_PAGE,
+        ordering=('-created', '-id')
+    )
+    return paginator.get_page(request.GET.get(CURSOR_PARAM))
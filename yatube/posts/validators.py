@@ -0,0 +1,36 @@
+from django.core.exceptions import ValidationError
+from PIL import Image
+
+from .constants import (POST_IMAGE_FORMATS, POST_IMAGE_MAX_PIXELS,
+                        POST_IMAGE_MAX_SIDE, POST_IMAGE_MAX_SIZE)
+
+IMAGE_TOO_LARGE = f'Файл больше {POST_IMAGE_MAX_SIZE // 2 ** 20} МБ.'
+
+
+def _image_header(file):
+    """Формат и размеры картинки по заголовку, без декодирования."""
+    image = getattr(file, 'image', None)
+    if image is not None:
+        return image.format, image.size
+    file.seek(0)
+    with Image.open(file) as image:
+        return image.format, image.size
+
+
+def validate_post_image(file):
+    if file.size > POST_IMAGE_MAX_SIZE:
+        raise ValidationError(IMAGE_TOO_LARGE)
+    try:
+        image_format, (width, height) = _image_header(file)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.')
+    if image_format not in POST_IMAGE_FORMATS:
+        raise ValidationError(
+            f'Допустимые форматы: {", ".join(POST_IMAGE_FORMATS)}.'
+        )
+    if max(width, height) > POST_IMAGE_MAX_SIDE:
+        raise ValidationError(
+            f'Сторона картинки больше {POST_IMAGE_MAX_SIDE} пикселей.'
+        )
+    if width * height > POST_IMAGE_MAX_PIXELS:
+        raise ValidationError('Слишком много пикселей в картинке.')
@@ -1,64 +1,138 @@
+from functools import partial
+
 from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db import IntegrityError
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.db import retry_on_lock
+from core.parallel import gather
+
+from . import search, thumbnails
+from .conditional import (conditional_feed, group_changed, index_changed,
+                          profile_changed)
+from .constants import (CURSOR_PARAM, PAGINATOR_COUNT, SEARCH_MAX_TERMS,
+                        SEARCH_PARAM)
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
-from .utils import pagination
+from .timeline import TimelinePaginator
+from .uploads import post_image_uploads, save_post, upload_too_large
+from .utils import comment_pagination, pagination
 
 
+@conditional_feed(index_changed)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.select_related('group', 'author')
+    posts = Post.objects.for_listing()
     context = pagination(posts, request)
 
     return render(request, template, context)
 
 
+def is_following(user, username):
+    return user.is_authenticated and Follow.objects.filter(
+        user=user,
+        author__username=username
+    ).exists()
+
+
+# Группа, автор и пост ищутся по ключу из URL параллельно со страницей
+# постов или комментариев (core.parallel.gather).
+@conditional_feed(group_changed)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = Post.objects.filter(group__slug=slug).for_listing()
+    group, page = gather(
+        partial(get_object_or_404, Group, slug=slug),
+        partial(pagination, posts, request),
+    )
     context = {'group': group}
-    context.update(pagination(posts, request))
+    context.update(page)
 
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_feed(profile_changed)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author
-    ).exists())
-    posts = author.posts.all()
+    posts = Post.objects.filter(author__username=username).for_listing()
+    author, following, page = gather(
+        partial(
+            get_object_or_404,
+            User.objects.select_related('stats'),
+            username=username
+        ),
+        partial(is_following, request.user, username),
+        partial(pagination, posts, request),
+    )
     context = {'author': author, 'following': following}
-    context.update(pagination(posts, request))
+    context.update(page)
 
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post, comments = gather(
+        partial(get_object_or_404, Post.objects.for_detail(), id=post_id),
+        partial(comment_pagination, post_id, request),
+    )
     form = CommentForm(request.POST or None)
-    all_comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'comments': all_comments
+        'comments': comments
     }
 
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая страница комментариев: фрагмент HTML или JSON."""
+    get_object_or_404(Post.objects.only('id'), id=post_id)
+    comments = comment_pagination(post_id, request)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next_cursor': comments.paginator.next_cursor,
+        })
+    context = {'comments': comments, 'post_id': post_id, 'fragment': True}
+
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def post_search(request):
+    query = request.GET.get(SEARCH_PARAM, '').strip()
+    context = {'query': query}
+    query_words = search.words(query)[:SEARCH_MAX_TERMS]
+    if query_words:
+        paginator = Paginator(
+            search.SearchResults(query_words), PAGINATOR_COUNT
+        )
+        context['page_obj'] = paginator.get_page(request.GET.get('page'))
+
+    return render(request, 'posts/search.html', context)
+
+
+@post_image_uploads
 @login_required
 def post_create(request):
     form = PostForm(
         request.POST or None,
-        files=request.FILES or None
+        files=request.FILES or None,
+        image_too_large=upload_too_large(request)
     )
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        save_post(post)
+        thumbnails.schedule(post)
 
         return redirect('posts:profile', request.user)
 
@@ -67,6 +141,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@post_image_uploads
 @login_required
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
@@ -76,10 +151,18 @@ def post_edit(request, post_id):
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        image_too_large=upload_too_large(request)
     )
     if form.is_valid():
-        form.save()
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            # Варианты старой картинки больше не подходят.
+            form.instance.image_variants = ''
+        post = form.save(commit=False)
+        save_post(post)
+        if image_changed:
+            thumbnails.schedule(post)
 
         return redirect('posts:post_detail', post_id)
 
@@ -99,34 +182,42 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        retry_on_lock(comment.save)()
 
     return redirect('posts:post_detail', post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    paginator = TimelinePaginator(request.user, PAGINATOR_COUNT)
+    page_obj = paginator.get_page(request.GET.get(CURSOR_PARAM))
 
-    return render(request, 'posts/follow.html', pagination(posts, request))
+    return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    follower_list = Follow.objects.filter(author=author, user=request.user)
-    if follower_list.exists() or request.user == author:
+    if request.user == author:
+        return redirect('posts:index')
+    try:
+        retry_on_lock(Follow.objects.create)(
+            author=author,
+            user=request.user
+        )
+    except IntegrityError:
+        # Уже подписан: уникальность (user, author) держит база.
         return redirect('posts:index')
-    Follow.objects.create(
-        author=author,
-        user=request.user
-    )
     return redirect('posts:profile', username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(author=author, user=request.user).delete()
+    follow = Follow.objects.filter(author=author, user=request.user).first()
+    if follow is not None:
+        # Сигналам удаления нужны имена обоих: не загружать их заново.
+        follow.author, follow.user = author, request.user
+        retry_on_lock(follow.delete)()
 
     return redirect('posts:profile', username)
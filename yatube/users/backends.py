@@ -0,0 +1,44 @@
+"""Бэкенд аутентификации с кешем пользователя.
+
+AuthenticationMiddleware на каждом запросе с сессией достаёт
+пользователя по id из сессии. ModelBackend делает это запросом к базе,
+CachedModelBackend - через кеш AUTH_USER_CACHE_ALIAS. Запись общая
+для всех сессий пользователя и удаляется при сохранении или удалении
+User (users.signals). Поэтому смена пароля сразу меняет хеш сессии,
+и старые сессии перестают действовать. QuerySet.update сигналов
+не шлёт: после него нужен forget_user.
+
+Удаление видно другим воркерам, только если кеш общий: кеш в памяти
+процесса отклоняет проверка users.E001 (users.checks).
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def user_cache():
+    return caches[settings.AUTH_USER_CACHE_ALIAS]
+
+
+def cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def forget_user(user_id):
+    # Без общего кеша пользователи не кешируются (ModelBackend).
+    if settings.AUTH_USER_CACHE_ALIAS in settings.CACHES:
+        user_cache().delete(cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = cache_key(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache().set(
+                    key, user, settings.AUTH_USER_CACHE_TIMEOUT
+                )
+        return user
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+CACHED_USER_BACKEND = 'users.backends.CachedModelBackend'
+LOCAL_CACHE_BACKENDS = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_shared_auth_caches(app_configs, **kwargs):
+    """Сессии и пользователи не кешируются в памяти процесса.
+
+    Выход или смена пароля в одном воркере не удалили бы запись
+    в кеше другого.
+    """
+    aliases = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES:
+        aliases.append(('SESSION_CACHE_ALIAS', settings.SESSION_ENGINE))
+    if CACHED_USER_BACKEND in settings.AUTHENTICATION_BACKENDS:
+        aliases.append(('AUTH_USER_CACHE_ALIAS', CACHED_USER_BACKEND))
+    errors = []
+    for setting, user in aliases:
+        alias = getattr(settings, setting)
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend is None or backend in LOCAL_CACHE_BACKENDS:
+            errors.append(Error(
+                f'Для {user} нужен общий кеш воркеров, а {setting} = '
+                f'{alias!r} - {backend or "нет в CACHES"}.',
+                hint='Задайте YATUBE_CACHE=shared или tiered.',
+                id='users.E001',
+            ))
+    return errors
@@ -0,0 +1,139 @@
+import re
+
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db import connection
+from django.test import (Client, SimpleTestCase, TestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import User
+from users.backends import cache_key
+from users.checks import check_shared_auth_caches
+
+# Запросы к сессиям и пользователям, но не JOIN автора поста.
+AUTH_QUERY = re.compile(r'^(SELECT .* FROM|INSERT INTO|UPDATE) '
+                        r'"(django_session|auth_user)"')
+
+
+# В тестах один процесс: кеш в памяти годится в качестве общего.
+@override_settings(
+    AUTHENTICATION_BACKENDS=['users.backends.CachedModelBackend'],
+    AUTH_USER_CACHE_ALIAS='default',
+    SESSION_CACHE_ALIAS='default'
+)
+class CachedAuthTest(TestCase):
+    """Сессия и пользователь читаются из кеша, а не из базы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', password='old-password-1'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            query['sql'] for query in queries
+            if AUTH_QUERY.match(query['sql'])
+        ]
+
+    def test_anonymous_index(self):
+        self.assertEqual(self.auth_queries(reverse('posts:index')), [])
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db'
+    )
+    def test_user_cached(self):
+        self.client.force_login(self.user)
+        self.auth_queries(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(cache_key(self.user.pk)))
+        self.assertEqual(self.auth_queries(reverse('posts:index')), [])
+
+    def test_password_change_logs_out(self):
+        """после смены пароля кеш не продлевает старые сессии"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('posts:index'))
+        # Копия: объект класса переживает откат базы между тестами.
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password-2')
+        user.save()
+        self.assertIsNone(cache.get(cache_key(user.pk)))
+        self.client.get(reverse('posts:index'))
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    def test_password_change_view_keeps_session(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('password_change'), {
+            'old_password': 'old-password-1',
+            'new_password1': 'new-password-2',
+            'new_password2': 'new-password-2',
+        })
+        self.assertRedirects(response, reverse('password_change_done'))
+        self.assertEqual(
+            self.client.session[SESSION_KEY], str(self.user.pk)
+        )
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'
+    )
+    def test_signed_cookies(self):
+        self.assertTrue(self.client.login(
+            username='reader', password='old-password-1'
+        ))
+        self.auth_queries(reverse('posts:index'))
+        self.assertEqual(self.auth_queries(reverse('posts:index')), [])
+
+
+LOCAL_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+SHARED_CACHES = {
+    **LOCAL_CACHES,
+    'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Кеш сессий и пользователей в памяти процесса отклоняется."""
+
+    def errors(self, **settings):
+        with override_settings(**settings):
+            return [
+                error.id for error in check_shared_auth_caches(None)
+            ]
+
+    def test_local_cache_rejected(self):
+        cached = {
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+            'AUTHENTICATION_BACKENDS': [
+                'users.backends.CachedModelBackend'
+            ],
+        }
+        for caches, alias in ((LOCAL_CACHES, 'shared'),
+                              (LOCAL_CACHES, 'default')):
+            with self.subTest(alias=alias):
+                self.assertEqual(
+                    self.errors(
+                        CACHES=caches, SESSION_CACHE_ALIAS=alias,
+                        AUTH_USER_CACHE_ALIAS=alias, **cached
+                    ),
+                    ['users.E001', 'users.E001']
+                )
+        self.assertEqual(self.errors(CACHES=SHARED_CACHES, **cached), [])
+
+    def test_uncached_allowed(self):
+        self.assertEqual(self.errors(
+            CACHES=LOCAL_CACHES,
+            SESSION_ENGINE='django.contrib.sessions.backends.db',
+            AUTHENTICATION_BACKENDS=[
+                'django.contrib.auth.backends.ModelBackend'
+            ]
+        ), [])
@@ -0,0 +1,22 @@
+"""
+ASGI config for yatube project.
+
+Django 2.2 has no ASGI support of its own: the WSGI application runs in
+a thread pool behind core.asgi.ASGIHandler. Run with any ASGI server::
+
+    uvicorn yatube.asgi:application
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from core.asgi import ASGIHandler
+from core.static import StaticFilesApplication
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = ASGIHandler(
+    StaticFilesApplication(get_wsgi_application()), settings.ASGI_THREADS
+)
@@ -0,0 +1,41 @@
+"""Окружение Jinja2 для шаблонов из каталога jinja2/.
+
+Глобальные функции и фильтры повторяют теги и фильтры Django,
+которые используют портированные шаблоны.
+"""
+from django.template.defaultfilters import (date, linebreaks_filter,
+                                            truncatechars)
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment
+
+from core.jinja2 import cache_fragment
+from core.templatetags.user_filters import addclass
+from posts.templatetags.post_images import post_picture
+
+
+def url(viewname, *args, **kwargs):
+    return reverse(viewname, args=args or None, kwargs=kwargs or None)
+
+
+def local_date(value, arg=None):
+    # Шаблоны Django переводят время в текущий часовой пояс сами.
+    return date(template_localtime(value), arg)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'cache_fragment': cache_fragment,
+        'post_picture': post_picture,
+        'static': static,
+        'url': url,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': local_date,
+        'linebreaks': linebreaks_filter,
+        'truncatechars': truncatechars,
+    })
+    return env
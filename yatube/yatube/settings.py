@@ -31,10 +31,15 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'jobs.apps.JobsConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.compression.CompressionMiddleware',
+    'core.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,37 +51,220 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
-TEMPLATES = [
-    {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
-        'OPTIONS': {
-            'context_processors': [
-                'django.template.context_processors.debug',
-                'django.template.context_processors.request',
-                'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages',
-                'core.context_processors.year.year',
-            ],
+# Ответы (core.compression): HTML без отступов шаблонов, сжатие br
+# (пакет brotli) или gzip. Уровень подходит обоим: gzip 1-9, br 0-11.
+# Одинаковые страницы берут сжатые байты из кеша.
+HTML_MINIFY = True
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SIZE = 200
+COMPRESSION_CACHE_TIMEOUT = 60 * 10
+
+# Шаблоны (YATUBE_TEMPLATES): debug - читаются и разбираются заново
+# при каждом рендере (по умолчанию при DEBUG), cached - разбираются
+# один раз на процесс, jinja2 - как cached, но страницы постов
+# рендерит Jinja2 (каталог jinja2/, нужен пакет Jinja2), остальные -
+# Django. Сравнить движки: manage.py bench_templates.
+TEMPLATE_MODE = os.getenv(
+    'YATUBE_TEMPLATES', 'debug' if DEBUG else 'cached'
+)
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+DJANGO_TEMPLATES = {
+    'BACKEND': 'core.metrics.DjangoTemplates',
+    'DIRS': [TEMPLATES_DIR],
+    'OPTIONS': {
+        'context_processors': [
+            'django.template.context_processors.debug',
+            'django.template.context_processors.request',
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+            'core.context_processors.year.year',
+        ],
+        'loaders': TEMPLATE_LOADERS if TEMPLATE_MODE == 'debug' else [
+            ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+        ],
+    },
+}
+JINJA2_TEMPLATES = {
+    'BACKEND': 'core.jinja2.Jinja2',
+    'DIRS': [os.path.join(BASE_DIR, 'jinja2')],
+    'OPTIONS': {
+        'environment': 'yatube.jinja2.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+            'core.context_processors.year.year',
+        ],
+        # Скомпилированный шаблон не сверяется с файлом на диске.
+        'auto_reload': False,
+    },
+}
+TEMPLATES = [DJANGO_TEMPLATES]
+if TEMPLATE_MODE == 'jinja2':
+    # Первым: шаблоны, которых нет в jinja2/, ищутся дальше у Django.
+    TEMPLATES.insert(0, JINJA2_TEMPLATES)
+
+# Конфигурация кеша выбирается переменной окружения YATUBE_CACHE:
+# local - память процесса, shared - общий файловый кеш воркеров,
+# tiered - LRU в памяти процесса перед общим файловым кешем.
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+SHARED_CACHE = {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': CACHE_DIR,
+}
+CACHE_CONFIGURATIONS = {
+    'local': {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    },
+    'shared': {
+        'default': SHARED_CACHE,
+        'shared': SHARED_CACHE,
+    },
+    'tiered': {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 5,
+                'SYNC_INTERVAL': 1,
+            },
         },
+        'shared': SHARED_CACHE,
     },
-]
+}
+CACHES = CACHE_CONFIGURATIONS[os.getenv('YATUBE_CACHE', 'local')]
+# Сжатые ответы (core.compression) - в отдельном ограниченном кеше
+# процесса, чтобы не вытеснять данные приложения. Ключ - хеш
+# содержимого, поэтому общий кеш и сброс не нужны.
+COMPRESSION_CACHE_ALIAS = 'compression'
+CACHES[COMPRESSION_CACHE_ALIAS] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'compression',
+    'TIMEOUT': COMPRESSION_CACHE_TIMEOUT,
+    'OPTIONS': {'MAX_ENTRIES': 300},
+}
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Замеры запросов (core.metrics): YATUBE_METRICS=1 включает заголовок
+# Server-Timing, счётчики кеша и сводку /debug/metrics/ для персонала.
+METRICS_ENABLED = os.getenv('YATUBE_METRICS') == '1'
+if METRICS_ENABLED:
+    CACHES = {
+        **CACHES,
+        'default': {
+            'BACKEND': 'core.metrics.InstrumentedCache',
+            'OPTIONS': {'CACHE': 'uninstrumented'},
+        },
+        'uninstrumented': CACHES['default'],
     }
+
+# Сессии (YATUBE_SESSIONS): cached_db - в базе, чтение через кеш,
+# запись в оба места; signed_cookies - подписанная cookie, без базы
+# и кеша; db - только база. Сессии и пользователи (users.backends)
+# кешируются только в общем кеше воркеров 'shared': в памяти процесса
+# другой воркер не узнал бы о выходе или смене пароля. Поэтому по
+# умолчанию cached_db и кеш пользователей включены, только если алиас
+# shared есть (YATUBE_CACHE=shared или tiered); иначе db и ModelBackend.
+# Кеш в памяти процесса под ними отклоняет проверка users.E001.
+SHARED_CACHE_ALIAS = 'shared'
+SESSION_CACHE_ALIAS = SHARED_CACHE_ALIAS
+AUTH_USER_CACHE_ALIAS = SHARED_CACHE_ALIAS
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
 }
+if SHARED_CACHE_ALIAS in CACHES:
+    SESSION_ENGINE = SESSION_ENGINES[
+        os.getenv('YATUBE_SESSIONS', 'cached_db')
+    ]
+    AUTHENTICATION_BACKENDS = ['users.backends.CachedModelBackend']
+else:
+    SESSION_ENGINE = SESSION_ENGINES[os.getenv('YATUBE_SESSIONS', 'db')]
+    AUTHENTICATION_BACKENDS = ['django.contrib.auth.backends.ModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 60 * 5
+
+# Журнал SQL (core.querylog): запросы дольше QUERYLOG_SLOW_MS и
+# QUERYLOG_DUPLICATES запросов одной формы за HTTP-запрос пишутся в лог
+# core.querylog с местом вызова. В строгом режиме повторы - исключение,
+# его включает тестовый раннер.
+QUERYLOG_SLOW_MS = 100
+QUERYLOG_DUPLICATES = 3
+QUERYLOG_STRICT = False
+TEST_RUNNER = 'core.testing.StrictQueriesRunner'
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Потоки для view за ASGI-обёрткой (yatube/asgi.py, core.asgi).
+ASGI_THREADS = int(os.getenv('YATUBE_ASGI_THREADS', 8))
+# Потоки для независимых запросов внутри view (core.parallel.gather),
+# 0 - по очереди. С локальным SQLite запросы короче переключения
+# потоков, параллельность окупается с сетевой СУБД.
+QUERY_THREADS = int(os.getenv('YATUBE_QUERY_THREADS', 0))
 
+# core.db.sqlite3 - стандартный бэкенд плюс PRAGMA на каждом соединении
+# и режим BEGIN. WAL: читатели не ждут писателя; synchronous=NORMAL
+# в WAL безопасен при сбое процесса; busy_timeout - ожидание
+# блокировки записи. Постоянные соединения (CONN_MAX_AGE) не платят
+# за открытие файла и PRAGMA на каждом запросе.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 600)),
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+                # Отрицательное значение - размер в КБ, а не в страницах.
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
     }
 }
+# Реплики для чтения (core.routers): пути к копиям базы через запятую
+# в YATUBE_REPLICAS, копии обновляет команда sync_replicas. В тестах
+# реплики - зеркала основной базы.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.getenv('YATUBE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи клиент читает основную базу.
+REPLICA_STICKY_SECONDS = 10
+REPLICA_STICKY_COOKIE = 'use_primary'
+
+# Повторы записи при "database is locked" (core.db.retry_on_lock).
+DATABASE_WRITE_RETRIES = 5
+DATABASE_RETRY_DELAY = 0.05
+
+# Фоновые задачи (jobs.queue). Задачи кладутся в таблицу базы, их
+# выполняет manage.py run_jobs, а запрос не ждёт. При DEBUG (и всегда
+# в тестах, см. core.testing) задача по умолчанию выполняется сразу
+# при постановке, как без очереди; YATUBE_JOBS_EAGER=1 или 0 задаёт
+# режим явно. Повторы упавшей задачи - через JOBS_RETRY_DELAY секунд,
+# пауза удваивается с каждой попыткой.
+JOBS_EAGER = os.getenv('YATUBE_JOBS_EAGER', '1' if DEBUG else '0') == '1'
+JOBS_WORKERS = 4
+JOBS_EXECUTOR = 'thread'
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+JOBS_POLL_INTERVAL = 1
+# Через сколько секунд задача упавшего воркера выдаётся снова.
+JOBS_LOCK_TIMEOUT = 600
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +292,13 @@ USE_L10N = True
 USE_TZ = True
 
 STATIC_URL = '/static/'
+# Сборка статики: manage.py collectstatic копирует файлы в STATIC_ROOT
+# с хешем содержимого в имени и сжатыми копиями (core.static).
+# Собранную статику отдаёт WSGI-обёртка из yatube/wsgi.py.
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_collected')
+STATICFILES_STORAGE = 'core.static.CompressedManifestStorage'
+# Кеширование файлов без хеша в имени, с.
+STATIC_MAX_AGE = 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'